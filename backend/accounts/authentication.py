@@ -0,0 +1,122 @@
+"""JWT authentication from signed claims, without loading the user row."""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import User, Profile
+
+STATE_KEY = "auth:user-state:{}"
+# The User fields the cached state is derived from.
+AUTH_STATE_FIELDS = {"is_active", "password"}
+
+def auth_hash(password_hash):
+    """Short hash that changes whenever the password does (see get_session_auth_hash)."""
+    return User(password=password_hash).get_session_auth_hash()[:16]
+
+class ArtFitRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_user_claims(user)
+        token["auth_hash"] = auth_hash(user.password)
+        return token
+
+    def set_user_claims(self, user):
+        try:
+            profile_id = user.profile.pk
+        except Profile.DoesNotExist:
+            profile_id = None
+        self["role"] = user.role
+        self["profile_id"] = profile_id
+        self["is_active"] = user.is_active
+
+class ArtFitTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ArtFitRefreshToken
+
+class ArtFitTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ArtFitRefreshToken
+
+    def validate(self, attrs):
+        # Access tokens copy the refresh token's claims, so re-read them from the user row; otherwise a role
+        # change would only show up at the next login. auth_hash is left alone: after a password change the
+        # refreshed access token must still be rejected.
+        refresh = self.token_class(attrs["refresh"])
+        user = User.objects.select_related("profile").filter(pk=refresh.get(api_settings.USER_ID_CLAIM)).first()
+        if user is not None and "auth_hash" in refresh:
+            refresh.set_user_claims(user)
+        return super().validate({**attrs, "refresh": str(refresh)})
+
+class ClaimsUser(TokenUser):
+    """request.user backed only by access-token claims."""
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def role(self):
+        return self.token.get("role", "BOTH")
+
+    @cached_property
+    def profile_id(self):
+        return self.token.get("profile_id")
+
+    @cached_property
+    def is_active(self):
+        return self.token.get("is_active", True)
+
+def _state_from_row(row):
+    return {"active": row[0], "auth_hash": auth_hash(row[1])} if row else {"active": False, "auth_hash": None}
+
+def get_user_state(user_id):
+    """Return {"active", "auth_hash"} for user_id from cache or one DB query; None if the user is gone."""
+    key = STATE_KEY.format(user_id)
+    state = cache.get(key)
+    if state is None:
+        state = _state_from_row(User.objects.filter(pk=user_id).values_list("is_active", "password").first())
+        cache.set(key, state, settings.AUTH_STATE_CACHE_TTL)
+    return state
+
+async def aget_user_state(user_id):
+    key = STATE_KEY.format(user_id)
+    state = await cache.aget(key)
+    if state is None:
+        state = _state_from_row(await User.objects.filter(pk=user_id).values_list("is_active", "password").afirst())
+        await cache.aset(key, state, settings.AUTH_STATE_CACHE_TTL)
+    return state
+
+def forget_user_state(user_id):
+    cache.delete(STATE_KEY.format(user_id))
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if "auth_hash" not in validated_token:
+            return super().get_user(validated_token)
+        user = ClaimsUser(validated_token)
+        return self._check_state(user, get_user_state(user.id))
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if "auth_hash" not in validated_token:
+            return await sync_to_async(super().get_user)(validated_token), validated_token
+        user = ClaimsUser(validated_token)
+        return self._check_state(user, await aget_user_state(user.id)), validated_token
+
+    def _check_state(self, user, state):
+        if not state["active"]:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if state["auth_hash"] != user.token["auth_hash"]:
+            raise AuthenticationFailed("Token has been revoked", code="token_not_valid")
+        return user
@@ -0,0 +1,66 @@
+"""Google ID-token verification with cached signing certificates."""
+import re
+import threading
+import time
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from google.auth import jwt as google_jwt
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+CACHE_KEY = "google:certs"
+DEFAULT_MAX_AGE = 60 * 60
+REFRESH_MARGIN = 5 * 60
+CLOCK_SKEW = 10
+
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=10))
+_certs = None  # (certs, expires_at)
+_refreshing = threading.Lock()
+
+def _max_age(cache_control):
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+def fetch_certs():
+    """Download the certs, publish them to both caches and return them."""
+    global _certs
+    response = _session.get(settings.GOOGLE_CERTS_URL, timeout=5)
+    response.raise_for_status()
+    max_age = _max_age(response.headers.get("Cache-Control"))
+    _certs = (response.json(), time.time() + max_age)
+    cache.set(CACHE_KEY, _certs, max_age)
+    return _certs[0]
+
+def _refresh_in_background():
+    if not _refreshing.acquire(blocking=False):
+        return
+    def run():
+        try:
+            fetch_certs()
+        except requests.RequestException:
+            pass  # keep serving the current certs; the next login retries
+        finally:
+            _refreshing.release()
+    threading.Thread(target=run, daemon=True).start()
+
+def get_certs():
+    global _certs
+    now = time.time()
+    if _certs is None or _certs[1] <= now:
+        _certs = cache.get(CACHE_KEY)
+    if _certs is None or _certs[1] <= now:
+        return fetch_certs()
+    if _certs[1] - now < REFRESH_MARGIN:
+        _refresh_in_background()
+    return _certs[0]
+
+def verify_google_id_token(token, client_id):
+    """Return the verified claims of a Google ID token; raises ValueError if it is invalid."""
+    certs = get_certs()
+    if google_jwt.decode_header(token).get("kid") not in certs:
+        certs = fetch_certs()
+    idinfo = google_jwt.decode(token, certs=certs, audience=client_id, clock_skew_in_seconds=CLOCK_SKEW)
+    if idinfo.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer {idinfo.get('iss')!r}")
+    return idinfo
@@ -0,0 +1,84 @@
+"""Off-request image renditions for Profile.avatar and Work.image."""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+from .models import Profile, Work
+
+logger = logging.getLogger(__name__)
+
+RENDITION_SIZES = {"thumb": 320, "medium": 960, "full": 2048}
+FORMATS = ["webp"] + (["avif"] if features.check("avif") else [])
+QUALITY = 80
+
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_PIPELINE_WORKERS, thread_name_prefix="renditions")
+    return _executor
+
+def rendition_path(name, size, fmt):
+    folder, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return f"{folder}/renditions/{stem}_{size}.{fmt}"
+
+def build_renditions(field_file):
+    """Resize field_file into every size/format and save them; return the renditions dict."""
+    with field_file.open("rb") as f:
+        img = ImageOps.exif_transpose(Image.open(f))
+        img.load()
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    renditions = {}
+    for size, edge in RENDITION_SIZES.items():
+        resized = img.copy()
+        resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        for fmt in FORMATS:
+            buf = BytesIO()
+            resized.save(buf, fmt.upper(), quality=QUALITY)
+            path = default_storage.save(rendition_path(field_file.name, size, fmt), ContentFile(buf.getvalue()))
+            renditions.setdefault(size, {})[fmt] = path
+    return renditions
+
+def rendition_urls(renditions):
+    return {size: {fmt: default_storage.url(path) for fmt, path in by_fmt.items()}
+            for size, by_fmt in (renditions or {}).items()}
+
+def process_work_image(work_id):
+    work = Work.objects.filter(pk=work_id).first()
+    if not work or not work.image:
+        return
+    renditions = build_renditions(work.image)
+    # Skip the write if the image was replaced while we were resizing.
+    Work.objects.filter(pk=work_id, image=work.image.name).update(renditions=renditions)
+
+def process_avatar(profile_id):
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if not profile or not profile.avatar:
+        return
+    renditions = build_renditions(profile.avatar)
+    Profile.objects.filter(pk=profile_id, avatar=profile.avatar.name).update(avatar_renditions=renditions)
+
+def _run(task, pk):
+    try:
+        task(pk)
+    except Exception:
+        logger.exception("Rendition task %s(%s) failed", task.__name__, pk)
+    finally:
+        close_old_connections()
+
+def schedule(task, pk):
+    """Run task(pk) once the current transaction commits, on the pool or inline."""
+    def submit():
+        if settings.IMAGE_PIPELINE_WORKERS:
+            _get_executor().submit(_run, task, pk)
+        else:
+            task(pk)
+    transaction.on_commit(submit)
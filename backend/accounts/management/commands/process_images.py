@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from accounts import images
+from accounts.models import Profile, Work
+
+class Command(BaseCommand):
+    help = "Generate renditions for works and avatars that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rebuild renditions even where they already exist.")
+
+    def handle(self, *args, **options):
+        works = Work.objects.exclude(image="")
+        profiles = Profile.objects.exclude(avatar="").exclude(avatar__isnull=True)
+        if not options["all"]:
+            works = works.filter(renditions={})
+            profiles = profiles.filter(avatar_renditions={})
+        done = 0
+        for pk in works.values_list("pk", flat=True).iterator():
+            images.process_work_image(pk)
+            done += 1
+        for pk in profiles.values_list("pk", flat=True).iterator():
+            images.process_avatar(pk)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} images."))
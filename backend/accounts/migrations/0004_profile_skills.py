@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_work_work_user_created_id_idx'),
+        ('marketplace', '0004_project_tag_array'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='skills',
+            field=models.ManyToManyField(blank=True, related_name='profiles', to='marketplace.skilltag'),
+        ),
+    ]
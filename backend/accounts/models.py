@@ -14,6 +14,9 @@ class Profile(models.Model):
     hourly_rate = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     availability = models.CharField(max_length=80, blank=True)
     avatar = models.ImageField(upload_to="avatars/", null=True, blank=True)
+    # Resized copies written by accounts.images; {size: {format: storage path}}.
+    avatar_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    skills = models.ManyToManyField("marketplace.SkillTag", blank=True, related_name="profiles")
     def __str__(self): return self.display_name or self.user.username
 
 
@@ -21,5 +24,8 @@ class Work(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="works")
     title = models.CharField(max_length=120)
     image = models.ImageField(upload_to="works/")
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [models.Index(fields=["user","-created_at","-id"], name="work_user_created_id_idx")]
     def __str__(self): return f"{self.user.username} · {self.title}"
@@ -1,42 +1,82 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Prefetch
 from rest_framework import serializers
+from artfit.fieldsets import SparseFieldsetMixin
+from .images import rendition_urls
 from .models import User, Profile, Work
+from .uploads import ALLOWED_CONTENT_TYPES, DIRECT_UPLOAD_DIRS, StoredImageField
+
+# /me/ embeds only the most recent works; the full list is paginated at /api/accounts/works/.
+WORKS_PREVIEW_LIMIT = 24
+
+def with_profile_and_works(queryset):
+    """Join each user's profile and prefetch their skill ids and a bounded slice of their works."""
+    recent_works = Work.objects.order_by("-created_at", "-id")[:WORKS_PREVIEW_LIMIT]
+    return queryset.select_related("profile").prefetch_related(
+        "profile__skills",
+        Prefetch("works", queryset=recent_works, to_attr="recent_works"),
+    )
 
 class ProfileSerializer(serializers.ModelSerializer):
+    avatar_renditions = serializers.SerializerMethodField()
     class Meta:
         model = Profile
-        fields = ["display_name","bio","location","portfolio_url","hourly_rate","availability","avatar"]
+        fields = ["display_name","bio","location","portfolio_url","hourly_rate","availability","avatar","avatar_renditions","skills"]
+    def get_avatar_renditions(self, obj): return rendition_urls(obj.avatar_renditions)
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ["id","username","role"]
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     profile = serializers.SerializerMethodField()
     works = serializers.SerializerMethodField()
     class Meta:
         model = User
         fields = ["id","username","email","role","first_name","last_name","profile","works"]
+        # Profile skills as tag objects rather than ids; marketplace imports this module, hence the path.
+        expandable_fields = {"skills": ("marketplace.serializers.SkillTagSerializer", {"source": "profile.skills", "many": True})}
     def get_profile(self, obj):
         try:
-            p = Profile.objects.filter(user=obj).first()
-            if not p:
-                return None
-            return ProfileSerializer(p).data
-        except Exception:
-            # In case the Profile table doesn't exist yet or other DB errors
+            p = obj.profile
+        except ObjectDoesNotExist:
             return None
+        return ProfileSerializer(p).data
     def get_works(self, obj):
+        # Prefetched by with_profile_and_works, or handed in by a view that already knows them.
+        works = getattr(obj, "recent_works", self.context.get("works_preview"))
+        if works is None:
+            works = obj.works.order_by("-created_at", "-id")[:WORKS_PREVIEW_LIMIT]
         return [
-            {"id": w.id, "title": w.title, "image": w.image.url if w.image else None, "created_at": w.created_at}
-            for w in Work.objects.filter(user=obj).order_by("-created_at")
+            {"id": w.id, "title": w.title, "image": w.image.url if w.image else None,
+             "renditions": rendition_urls(w.renditions), "created_at": w.created_at}
+            for w in works
         ]
 
 class ProfileUpdateSerializer(serializers.ModelSerializer):
+    avatar = StoredImageField(required=False, allow_null=True)
     class Meta:
         model = Profile
-        fields = ["display_name","bio","location","portfolio_url","hourly_rate","availability","avatar"]
+        fields = ["display_name","bio","location","portfolio_url","hourly_rate","availability","avatar","skills"]
 
 class WorkSerializer(serializers.ModelSerializer):
+    image = StoredImageField()
+    renditions = serializers.SerializerMethodField()
     class Meta:
         model = Work
-        fields = ["id","title","image","created_at"]
+        fields = ["id","title","image","renditions","created_at"]
         read_only_fields = ["id","created_at"]
+    def get_renditions(self, obj): return rendition_urls(obj.renditions)
+
+class PresignUploadSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=sorted(DIRECT_UPLOAD_DIRS))
+    content_type = serializers.ChoiceField(choices=sorted(ALLOWED_CONTENT_TYPES))
+
+class ConfirmUploadSerializer(serializers.Serializer):
+    upload_token = serializers.CharField()
+    etag = serializers.CharField(required=False)
+    title = serializers.CharField(max_length=120, required=False)
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
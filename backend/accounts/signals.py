@@ -1,9 +1,18 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from .authentication import AUTH_STATE_FIELDS, forget_user_state
 from .models import User, Profile
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance: User, created: bool, **kwargs):
     if created:
-        Profile.objects.get_or_create(user=instance)
+        # A brand-new user cannot have a profile yet, so skip get_or_create's lookup.
+        Profile.objects.create(user=instance)
 
+
+@receiver(post_save, sender=User)
+def refresh_cached_auth_state(sender, instance: User, created: bool, update_fields=None, **kwargs):
+    # Deactivation and password changes must reach ClaimsJWTAuthentication immediately; saves that name
+    # only other fields (e.g. last_login on every login) leave the cached state alone.
+    if not created and (update_fields is None or AUTH_STATE_FIELDS & update_fields):
+        forget_user_state(instance.pk)
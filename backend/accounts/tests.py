@@ -0,0 +1,312 @@
+import datetime
+import json
+import os
+import tempfile
+import time
+from io import BytesIO
+from unittest import mock
+import requests
+import responses
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+from google.auth import crypt, jwt as google_jwt
+from moto import mock_aws
+from PIL import Image
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from marketplace.models import SkillTag
+from . import google
+from .authentication import ArtFitRefreshToken, ClaimsJWTAuthentication, ClaimsUser
+from .models import User, Work
+from .serializers import WORKS_PREVIEW_LIMIT
+from .uploads import DIRECT_UPLOAD_SALT, PRESIGN_EXPIRES, sniff_image
+
+class MeQueryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("artist")
+        self.user.profile.skills.set([SkillTag.objects.create(name=name) for name in ("Python", "Figma")])
+        self.client.force_authenticate(self.user)
+
+    def add_works(self, count):
+        Work.objects.bulk_create(Work(user=self.user, title=f"Work {i}", image=f"works/{i}.png") for i in range(count))
+
+    def test_query_count_does_not_grow_with_works(self):
+        for total in (1, 10):
+            self.add_works(total - Work.objects.count())
+            # The user joined to its profile, then the profile's skills and the recent works.
+            with self.subTest(works=total), self.assertNumQueries(3):
+                response = self.client.get("/api/accounts/me/")
+                self.assertEqual(len(response.data["works"]), total)
+                self.assertEqual(len(response.data["profile"]["skills"]), 2)
+
+    def test_works_past_the_preview_are_paged_at_the_works_endpoint(self):
+        self.add_works(WORKS_PREVIEW_LIMIT + 1)
+        self.assertEqual(len(self.client.get("/api/accounts/me/").data["works"]), WORKS_PREVIEW_LIMIT)
+        ids, url = [], "/api/accounts/works/"
+        while url:
+            page = self.client.get(url).data
+            ids += [work["id"] for work in page["results"]]
+            url = page["next"]
+        self.assertCountEqual(ids, Work.objects.values_list("id", flat=True))
+
+class ClaimsAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("artist", password="old-password", role="DEV")
+        self.refresh = ArtFitRefreshToken.for_user(self.user)
+
+    def authenticate(self, token=None):
+        token = token or self.refresh.access_token
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return ClaimsJWTAuthentication().authenticate(request)[0]
+
+    def test_claims_user_without_reading_the_user_row(self):
+        self.authenticate()  # caches the user's state
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.id, user.role, user.profile_id), (self.user.pk, "DEV", self.user.profile.pk))
+
+    def test_deactivation_and_password_change_reject_issued_tokens(self):
+        self.authenticate()
+        self.user.set_password("new-password")
+        self.user.save()
+        with self.assertRaisesMessage(AuthenticationFailed, "revoked"):
+            self.authenticate()
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        with self.assertRaisesMessage(AuthenticationFailed, "inactive"):
+            self.authenticate(ArtFitRefreshToken.for_user(self.user).access_token)
+
+    def test_last_login_save_keeps_the_cached_state(self):
+        self.authenticate()
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=["last_login"])
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_refresh_picks_up_a_role_change(self):
+        self.user.role = "DES"
+        self.user.save()
+        response = self.client.post("/api/token/refresh/", {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data["access"])["role"], "DES")
+        self.assertEqual(self.authenticate(response.data["access"]).role, "DES")
+
+    def test_refresh_after_a_password_change_is_still_revoked(self):
+        self.user.set_password("new-password")
+        self.user.save()
+        access = self.client.post("/api/token/refresh/", {"refresh": str(self.refresh)}).data["access"]
+        with self.assertRaisesMessage(AuthenticationFailed, "revoked"):
+            self.authenticate(access)
+
+def png(name="work.png"):
+    buf = BytesIO()
+    Image.new("RGB", (8, 8)).save(buf, "PNG")
+    return SimpleUploadedFile(name, buf.getvalue(), content_type="image/png")
+
+class StreamingUploadCleanupTests(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.media = media.name
+        self.client.force_authenticate(User.objects.create_user("artist"))
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media) for name in names]
+
+    def test_a_stored_work_image_is_kept(self):
+        response = self.client.post("/api/accounts/works/", {"title": "Cat", "image": png()}, format="multipart")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_invalid_data_deletes_the_stored_image(self):
+        response = self.client.post("/api/accounts/works/", {"image": png()}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("title", response.data)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_a_rejected_file_deletes_the_ones_already_stored(self):
+        response = self.client.post("/api/accounts/works/", {"title": "Cat", "image": png(), "extra": png("extra.png")}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored_files(), [])
+        self.assertFalse(Work.objects.exists())
+
+@mock_aws
+@override_settings(
+    USE_S3=True, STORAGES={**settings.STORAGES, "default": {"BACKEND": "artfit.storage.MediaS3Storage"}},
+    AWS_STORAGE_BUCKET_NAME="artfit-test", AWS_S3_REGION_NAME="us-east-1", AWS_S3_CUSTOM_DOMAIN=None,
+    AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing", AWS_DEFAULT_ACL=None,
+    MAX_IMAGE_UPLOAD_SIZE=64 * 1024,
+)
+class DirectUploadTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("artist"))
+        self.s3 = default_storage.connection.meta.client
+        self.s3.create_bucket(Bucket="artfit-test")
+
+    def presign(self, kind="work", content_type="image/png"):
+        response = self.client.post("/api/accounts/uploads/presign/", {"kind": kind, "content_type": content_type}, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def upload(self, presigned, body, **fields):
+        # What the browser sends: the presigned fields, then the file.
+        return requests.post(presigned["url"], data={**presigned["fields"], **fields}, files={"file": ("work.png", body)})
+
+    def confirm(self, token, **data):
+        return self.client.post("/api/accounts/uploads/confirm/", {"upload_token": token, **data}, format="json")
+
+    def keys(self):
+        return [obj["Key"] for obj in self.s3.list_objects_v2(Bucket="artfit-test").get("Contents", [])]
+
+    def test_presign_post_and_confirm_creates_the_work(self):
+        presigned = self.presign()
+        self.assertTrue(presigned["key"].startswith("works/"))
+        self.assertEqual(self.upload(presigned, png().read()).status_code, 204)
+        response = self.confirm(presigned["upload_token"], title="Cat")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Work.objects.get().image.name, presigned["key"])
+        self.assertEqual(self.keys(), [presigned["key"]])
+
+    def test_a_token_for_a_key_outside_the_upload_dir_is_refused(self):
+        presigned = self.presign()
+        name = presigned["key"].replace("works/", "avatars/")
+        self.s3.put_object(Bucket="artfit-test", Key=name, Body=png().read(), ContentType="image/png")
+        claims = signing.loads(presigned["upload_token"], salt=DIRECT_UPLOAD_SALT)
+        response = self.confirm(signing.dumps({**claims, "name": name}, salt=DIRECT_UPLOAD_SALT))
+        self.assertEqual(response.data, {"error": "Invalid or expired upload token."})
+        self.assertFalse(Work.objects.exists())
+
+    def test_forged_and_expired_tokens_are_refused(self):
+        presigned = self.presign()
+        self.upload(presigned, png().read())
+        self.assertEqual(self.confirm(presigned["upload_token"] + "x").data, {"error": "Invalid or expired upload token."})
+        with mock.patch("django.core.signing.time.time", return_value=time.time() + 3 * PRESIGN_EXPIRES):
+            self.assertEqual(self.confirm(presigned["upload_token"]).data, {"error": "Invalid or expired upload token."})
+        self.assertFalse(Work.objects.exists())
+
+    def test_an_oversize_object_is_refused_and_deleted(self):
+        presigned = self.presign()
+        # S3 enforces the policy's content-length-range; confirm checks again in case it didn't.
+        self.s3.put_object(Bucket="artfit-test", Key=presigned["key"], Body=png().read() + bytes(64 * 1024), ContentType="image/png")
+        response = self.confirm(presigned["upload_token"])
+        self.assertEqual(response.data, {"error": "Upload exceeds the maximum allowed size."})
+        self.assertEqual(self.keys(), [])
+
+    def test_non_image_content_is_refused_and_deleted(self):
+        presigned = self.presign()
+        self.upload(presigned, b"#!/bin/sh\necho hi\n")
+        response = self.confirm(presigned["upload_token"])
+        self.assertEqual(response.data, {"error": "Upload a valid image."})
+        self.assertEqual(self.keys(), [])
+        self.assertFalse(Work.objects.exists())
+
+    @override_settings(AWS_LOCATION="media", STORAGES={**settings.STORAGES, "default": {"BACKEND": "artfit.storage.MediaS3Storage"}})
+    def test_keys_are_under_the_storage_location(self):
+        streamed = self.client.post("/api/accounts/works/", {"title": "Streamed", "image": png()}, format="multipart")
+        self.assertEqual(streamed.status_code, 201)
+        presigned = self.presign()
+        self.assertEqual(self.upload(presigned, png().read()).status_code, 204)
+        self.assertEqual(self.confirm(presigned["upload_token"], title="Direct").status_code, 201)
+        self.assertCountEqual(self.keys(), [f"media/{work.image.name}" for work in Work.objects.all()])
+
+    def test_sniffing_is_specific_about_what_it_swallows(self):
+        header = png().read()
+        self.assertEqual(sniff_image(header), ("PNG", (8, 8)))
+        self.assertIsNone(sniff_image(header[:8]))
+        self.assertIsNone(sniff_image(b"#!/bin/sh"))
+        with mock.patch("accounts.uploads.Image.open", side_effect=MemoryError), self.assertRaises(MemoryError):
+            sniff_image(header)
+
+CERTS_URL = "https://certs.test/oauth2/v1/certs"
+
+def signing_key(kid):
+    """A fresh RSA key and the self-signed certificate Google would publish for it under ``kid``."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, kid)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number()).not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return crypt.RSASigner.from_string(pem, kid), cert.public_bytes(serialization.Encoding.PEM).decode()
+
+@mock.patch.dict(os.environ, {"GOOGLE_CLIENT_ID": "artfit.apps.googleusercontent.com"})
+@override_settings(GOOGLE_CERTS_URL=CERTS_URL)
+class GoogleAuthTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.signer, cls.cert = signing_key("key-1")
+        cls.rotated_signer, cls.rotated_cert = signing_key("key-2")
+
+    def setUp(self):
+        google._certs = None
+        cache.delete(google.CACHE_KEY)
+        # The certs Google currently publishes; a test rotates them by adding a key.
+        self.published = {"key-1": self.cert}
+        self.certs_url = responses.RequestsMock()
+        self.certs_url.add_callback(responses.GET, CERTS_URL, callback=lambda request: (
+            200, {"Cache-Control": "public, max-age=3600"}, json.dumps(self.published),
+        ))
+        self.certs_url.start()
+        self.addCleanup(self.certs_url.stop)
+
+    def token(self, signer=None, **claims):
+        now = int(time.time())
+        payload = {
+            "iss": "https://accounts.google.com", "aud": "artfit.apps.googleusercontent.com", "sub": "1234567890",
+            "email": "ada@example.com", "name": "Ada", "iat": now, "exp": now + 3600, **claims,
+        }
+        return google_jwt.encode(signer or self.signer, payload).decode()
+
+    def login(self, token):
+        return self.client.post("/api/accounts/google-auth/", {"token": token}, format="json")
+
+    def test_a_valid_token_signs_in_and_caches_the_certs(self):
+        response = self.login(self.token())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["user"]["email"], "ada@example.com")
+        self.assertTrue(response.data["is_new_user"])
+        self.assertFalse(self.login(self.token()).data["is_new_user"])
+        self.assertEqual(len(self.certs_url.calls), 1)
+
+    def test_an_expired_token_is_refused(self):
+        response = self.login(self.token(iat=int(time.time()) - 7200, exp=int(time.time()) - 3600))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"error": "Invalid Google token"})
+
+    def test_a_token_for_another_audience_is_refused(self):
+        response = self.login(self.token(aud="someone-else.apps.googleusercontent.com"))
+        self.assertEqual(response.data, {"error": "Invalid Google token"})
+
+    def test_a_token_from_another_issuer_is_refused(self):
+        response = self.login(self.token(iss="https://evil.example"))
+        self.assertEqual(response.data, {"error": "Invalid Google token"})
+
+    def test_an_unknown_kid_refetches_the_rotated_certs_once(self):
+        self.assertEqual(self.login(self.token()).status_code, 200)
+        self.published["key-2"] = self.rotated_cert
+        response = self.login(self.token(self.rotated_signer, sub="2234567890", email="grace@example.com"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.certs_url.calls), 2)
+
+    def test_a_kid_google_never_published_is_refused(self):
+        stranger, _ = signing_key("key-9")
+        self.assertEqual(self.login(self.token(stranger)).data, {"error": "Invalid Google token"})
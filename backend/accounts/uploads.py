@@ -0,0 +1,299 @@
+"""Streaming image uploads that go straight to their final storage key, and presigned direct uploads to S3."""
+import os
+import uuid
+from io import BytesIO
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParser as DjangoMultiPartParser, MultiPartParserError
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif", "image/avif"}
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "AVIF"}
+# Give up on sniffing a header that has not parsed within this many bytes.
+HEADER_SNIFF_LIMIT = 1024 * 1024
+S3_PART_SIZE = 5 * 1024 * 1024
+# Direct uploads: how long a presigned POST (and the token that confirms it) stays valid.
+PRESIGN_EXPIRES = 10 * 60
+DIRECT_UPLOAD_DIRS = {"work": "works/", "avatar": "avatars/"}
+DIRECT_UPLOAD_SALT = "accounts.direct-upload"
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif", "image/avif": ".avif"}
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Upload exceeds the maximum allowed size."
+    default_code = "upload_too_large"
+
+class StoredUpload(UploadedFile):
+    """An upload that the handler already wrote to default_storage as ``storage_name``."""
+    def __init__(self, storage_name, name, content_type, size, dimensions):
+        super().__init__(file=None, name=name, content_type=content_type, size=size)
+        self.storage_name = storage_name
+        self.dimensions = dimensions
+
+    def close(self):
+        # Nothing is open: the bytes are already in storage. Django closes uploads after errors.
+        pass
+
+class LocalSink:
+    def __init__(self, name, content_type):
+        self.name = default_storage.get_available_name(name)
+        self.path = default_storage.path(self.name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.fh = open(self.path, "xb")
+
+    def write(self, data):
+        self.fh.write(data)
+
+    def close(self):
+        self.fh.close()
+        return self.name
+
+    def abort(self):
+        self.fh.close()
+        os.remove(self.path)
+
+class S3MultipartSink:
+    def __init__(self, name, content_type):
+        self.name = default_storage.get_available_name(name)
+        self.client = default_storage.connection.meta.client
+        self.bucket = default_storage.bucket_name
+        self.key = default_storage.object_key(self.name)
+        params = {**getattr(settings, "AWS_S3_OBJECT_PARAMETERS", {}), "ContentType": content_type}
+        if getattr(settings, "AWS_DEFAULT_ACL", None):
+            params["ACL"] = settings.AWS_DEFAULT_ACL
+        self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **params)["UploadId"]
+        self.parts = []
+        self.buffer = bytearray()
+
+    def _flush(self):
+        part = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=len(self.parts) + 1, Body=bytes(self.buffer),
+        )
+        self.parts.append({"PartNumber": len(self.parts) + 1, "ETag": part["ETag"]})
+        self.buffer.clear()
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= S3_PART_SIZE:
+            self._flush()
+
+    def close(self):
+        if self.buffer or not self.parts:
+            self._flush()
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts},
+        )
+        return self.name
+
+    def abort(self):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+def sniff_image(header):
+    """Return (format, (width, height)) from leading bytes, or None if more bytes are needed."""
+    try:
+        img = Image.open(BytesIO(header))
+        return img.format, img.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        # Not (yet) a recognisable header, or claiming more pixels than Pillow will open.
+        return None
+
+class StreamingImageUploadHandler(FileUploadHandler):
+    def __init__(self, request, upload_dirs):
+        super().__init__(request)
+        self.upload_dirs = upload_dirs
+        self.max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+        self.sink = None
+        self.stored = []
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_size + 64 * 1024:  # allow for multipart framing and text fields
+            raise UploadTooLarge()
+
+    def _reject(self, message):
+        self.upload_interrupted()
+        raise serializers.ValidationError({self.field_name: [message]})
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name not in self.upload_dirs:
+            self._reject("Unexpected file field.")
+        if content_type not in ALLOWED_CONTENT_TYPES:
+            self._reject(f"Unsupported content type {content_type!r}.")
+        self.header = bytearray()
+        self.dimensions = None
+        self.received = 0
+
+    def _check_header(self, final=False):
+        sniffed = sniff_image(bytes(self.header))
+        if sniffed is None:
+            if final or len(self.header) > HEADER_SNIFF_LIMIT:
+                self._reject("Upload a valid image.")
+            return
+        fmt, (width, height) = sniffed
+        if fmt not in ALLOWED_FORMATS:
+            self._reject(f"Unsupported image format {fmt}.")
+        if max(width, height) > settings.MAX_IMAGE_DIMENSION:
+            self._reject(f"Image dimensions {width}x{height} exceed {settings.MAX_IMAGE_DIMENSION}px.")
+        self.dimensions = (width, height)
+        sink_class = S3MultipartSink if settings.USE_S3 else LocalSink
+        name = default_storage.generate_filename(os.path.join(self.upload_dirs[self.field_name], self.file_name))
+        self.sink = sink_class(name, self.content_type)
+        self.sink.write(bytes(self.header))
+        self.header = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.upload_interrupted()
+            raise UploadTooLarge()
+        if self.sink is None:
+            self.header += raw_data
+            self._check_header()
+        else:
+            self.sink.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.sink is None:
+            self._check_header(final=True)
+        storage_name = self.sink.close()
+        self.sink = None
+        self.stored.append(storage_name)
+        return StoredUpload(storage_name, self.file_name, self.content_type, file_size, self.dimensions)
+
+    def upload_interrupted(self):
+        if self.sink is not None:
+            sink, self.sink = self.sink, None
+            sink.abort()
+
+    def upload_complete(self):
+        # A file the stream ended in the middle of never reached file_complete.
+        self.upload_interrupted()
+
+    def discard(self):
+        """Abort the file in progress and delete the ones already stored."""
+        try:
+            self.upload_interrupted()
+        finally:
+            delete_stored(self.stored)
+
+class StreamingImageParser(MultiPartParser):
+    """MultiPartParser that streams the view's model file fields through StreamingImageUploadHandler."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context["request"]
+        view = parser_context["view"]
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta["CONTENT_TYPE"] = media_type
+        model = view.get_serializer_class().Meta.model
+        upload_dirs = {
+            f.name: f.upload_to for f in model._meta.get_fields()
+            if getattr(f, "upload_to", None) and isinstance(f.upload_to, str)
+        }
+        handler = StreamingImageUploadHandler(request._request, upload_dirs)
+        parsed = False
+        try:
+            data, files = DjangoMultiPartParser(meta, stream, [handler], encoding).parse()
+            parsed = True
+        except MultiPartParserError as exc:
+            raise ParseError("Multipart form parse error - %s" % str(exc))
+        finally:
+            # Django's parser doesn't call the handler on errors or disconnects.
+            if not parsed:
+                handler.discard()
+        request.stored_uploads = handler.stored
+        return DataAndFiles(data, files)
+
+def delete_stored(names):
+    for name in names:
+        default_storage.delete(name)
+
+class DiscardStoredUploadsMixin:
+    """For views parsing with StreamingImageParser: a refused request deletes what the parser stored."""
+
+    def handle_exception(self, exc):
+        # API exceptions are raised before the model saves; a 500 may come after it.
+        if isinstance(exc, APIException):
+            delete_stored(getattr(self.request, "stored_uploads", ()))
+        return super().handle_exception(exc)
+
+class StoredImageField(serializers.ImageField):
+    """ImageField that accepts a StoredUpload as its already-saved storage name."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, StoredUpload):
+            return data.storage_name
+        return super().to_internal_value(data)
+
+
+class DirectUploadError(Exception):
+    pass
+
+def presign_upload(user, kind, content_type):
+    """
+    Reserve a server-chosen key under works/ or avatars/ and presign a browser POST to it.
+    S3 enforces the content type and MAX_IMAGE_UPLOAD_SIZE; the returned token binds
+    the key to this user for confirm_upload.
+    """
+    name = f"{DIRECT_UPLOAD_DIRS[kind]}{uuid.uuid4().hex}{EXTENSIONS[content_type]}"
+    key = default_storage.object_key(name)
+    fields = {"Content-Type": content_type}
+    cache_control = getattr(settings, "AWS_S3_OBJECT_PARAMETERS", {}).get("CacheControl")
+    if cache_control:
+        fields["Cache-Control"] = cache_control
+    if getattr(settings, "AWS_DEFAULT_ACL", None):
+        fields["acl"] = settings.AWS_DEFAULT_ACL
+    conditions = [{k: v} for k, v in fields.items()]
+    conditions.append(["content-length-range", 1, settings.MAX_IMAGE_UPLOAD_SIZE])
+    post = default_storage.connection.meta.client.generate_presigned_post(
+        Bucket=default_storage.bucket_name, Key=key, Fields=fields,
+        Conditions=conditions, ExpiresIn=PRESIGN_EXPIRES,
+    )
+    token = signing.dumps({"name": name, "kind": kind, "user": user.pk, "ct": content_type}, salt=DIRECT_UPLOAD_SALT)
+    return {"url": post["url"], "fields": post["fields"], "key": name, "upload_token": token}
+
+def confirm_upload(user, token, etag=None):
+    """
+    Check that the object behind ``token`` exists and is an acceptable image.
+    Returns (kind, storage name). Rejected objects are deleted.
+    """
+    try:
+        claims = signing.loads(token, salt=DIRECT_UPLOAD_SALT, max_age=PRESIGN_EXPIRES * 2)
+    except signing.BadSignature:
+        raise DirectUploadError("Invalid or expired upload token.")
+    if claims["user"] != user.pk or not claims["name"].startswith(DIRECT_UPLOAD_DIRS[claims["kind"]]):
+        raise DirectUploadError("Invalid or expired upload token.")
+    client = default_storage.connection.meta.client
+    bucket, key = default_storage.bucket_name, default_storage.object_key(claims["name"])
+    try:
+        head = client.head_object(Bucket=bucket, Key=key)
+    except client.exceptions.ClientError:
+        raise DirectUploadError("Upload not found.")
+    problem = None
+    if head["ContentLength"] > settings.MAX_IMAGE_UPLOAD_SIZE:
+        problem = "Upload exceeds the maximum allowed size."
+    elif head.get("ContentType") != claims["ct"]:
+        problem = "Uploaded content type does not match."
+    elif etag and head["ETag"].strip('"') != etag.strip('"'):
+        problem = "Uploaded object does not match the given ETag."
+    else:
+        header = client.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{HEADER_SNIFF_LIMIT - 1}")["Body"].read()
+        sniffed = sniff_image(header)
+        if sniffed is None or sniffed[0] not in ALLOWED_FORMATS:
+            problem = "Upload a valid image."
+        elif max(sniffed[1]) > settings.MAX_IMAGE_DIMENSION:
+            problem = f"Image dimensions exceed {settings.MAX_IMAGE_DIMENSION}px."
+    if problem:
+        client.delete_object(Bucket=bucket, Key=key)
+        raise DirectUploadError(problem)
+    return claims["kind"], claims["name"]
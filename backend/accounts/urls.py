@@ -1,14 +1,18 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RegisterView, MeView, ProfileUpdateView, WorkViewSet, google_auth
+from artfit.async_views import async_read_view
+from .views import RegisterView, MeView, ProfileUpdateView, WorkViewSet, google_auth, presign_direct_upload, confirm_direct_upload
 
 router = DefaultRouter()
 router.register(r"works", WorkViewSet, basename="works")
 
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
-    path("me/", MeView.as_view(), name="me"),
+    path("me/", async_read_view(MeView) if settings.ASYNC_READ_VIEWS else MeView.as_view(), name="me"),
     path("profile/", ProfileUpdateView.as_view(), name="profile-update"),
     path("google-auth/", google_auth, name="google-auth"),
+    path("uploads/presign/", presign_direct_upload, name="upload-presign"),
+    path("uploads/confirm/", confirm_direct_upload, name="upload-confirm"),
     path("", include(router.urls)),
 ]
@@ -1,15 +1,30 @@
 from rest_framework import generics, permissions, viewsets, status
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import FormParser
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework_simplejwt.tokens import RefreshToken
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from django.conf import settings
-from .serializers import RegisterSerializer, UserSerializer, ProfileUpdateSerializer, WorkSerializer
+from django.db import transaction
+from google.auth.exceptions import GoogleAuthError
+from artfit.async_views import AsyncReadMixin
+from artfit.fieldsets import SparseFieldsetViewMixin
+from .serializers import (
+    RegisterSerializer, UserSerializer, ProfileSerializer, ProfileUpdateSerializer, WorkSerializer,
+    PresignUploadSerializer, ConfirmUploadSerializer, with_profile_and_works,
+)
+from .authentication import ArtFitRefreshToken
+from .google import verify_google_id_token
 from .models import User, Profile, Work
+from .uploads import StreamingImageParser, DiscardStoredUploadsMixin, DirectUploadError, presign_upload, confirm_upload
+from . import images
 import os
 
+def own_profile(user):
+    """The requesting user's Profile; claims-based users carry its id in the token."""
+    profile_id = getattr(user, "profile_id", None)
+    if profile_id:
+        return Profile.objects.get(pk=profile_id)
+    return Profile.objects.get(user_id=user.pk)
+
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
@@ -20,33 +35,97 @@ class RegisterView(generics.CreateAPIView):
         user = serializer.save()
         
         # Generate JWT tokens for automatic login
-        refresh = RefreshToken.for_user(user)
+        refresh = ArtFitRefreshToken.for_user(user)
         
         return Response({
-            'user': UserSerializer(user).data,
+            # A new account has no works; saves UserSerializer a query.
+            'user': UserSerializer(user, context={'works_preview': []}).data,
             'access': str(refresh.access_token),
             'refresh': str(refresh),
         }, status=status.HTTP_201_CREATED)
 
-class MeView(generics.RetrieveUpdateAPIView):
+class MeView(SparseFieldsetViewMixin, AsyncReadMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
-    def get_object(self): return self.request.user
+    # filter_queryset drops the profile and works prefetches when ?fields=/?omit= leave them out.
+    def get_queryset(self):
+        return with_profile_and_works(User.objects.filter(pk=self.request.user.pk))
+    def get_object(self):
+        return self.filter_queryset(self.get_queryset()).get()
+    async def aget_object(self):
+        return await self.filter_queryset(self.get_queryset()).aget()
 
-class ProfileUpdateView(generics.UpdateAPIView):
+class ProfileUpdateView(DiscardStoredUploadsMixin, generics.UpdateAPIView):
     serializer_class = ProfileUpdateSerializer
     permission_classes = [permissions.IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
-    def get_object(self): return self.request.user.profile
+    parser_classes = [StreamingImageParser, FormParser]
+    def get_object(self): return own_profile(self.request.user)
+    def perform_update(self, serializer):
+        if "avatar" in serializer.validated_data:
+            # Old renditions belong to the previous avatar; new ones arrive asynchronously.
+            profile = serializer.save(avatar_renditions={})
+            if profile.avatar:
+                images.schedule(images.process_avatar, profile.pk)
+        else:
+            serializer.save()
 
-class WorkViewSet(viewsets.ModelViewSet):
+class WorkViewSet(DiscardStoredUploadsMixin, viewsets.ModelViewSet):
     serializer_class = WorkSerializer
     permission_classes = [permissions.IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [StreamingImageParser, FormParser]
     def get_queryset(self):
-        return Work.objects.filter(user=self.request.user).order_by('-created_at')
+        return Work.objects.filter(user_id=self.request.user.pk).order_by('-created_at')
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        work = serializer.save(user_id=self.request.user.pk)
+        images.schedule(images.process_work_image, work.pk)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def presign_direct_upload(request):
+    """
+    Step 1 of a direct upload: returns a presigned S3 POST for a server-chosen
+    works/ or avatars/ key, plus an upload_token to confirm it with.
+    """
+    if not settings.USE_S3:
+        return Response({'error': 'Direct uploads require S3 storage'}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = PresignUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response(presign_upload(request.user, **serializer.validated_data), status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def confirm_direct_upload(request):
+    """
+    Step 2 of a direct upload: verifies the uploaded object (size, content type,
+    optional ETag, image header) and creates the Work or sets the avatar.
+    """
+    if not settings.USE_S3:
+        return Response({'error': 'Direct uploads require S3 storage'}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = ConfirmUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    try:
+        kind, name = confirm_upload(request.user, data['upload_token'], data.get('etag'))
+    except DirectUploadError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if kind == 'avatar':
+        profile = own_profile(request.user)
+        profile.avatar = name
+        profile.avatar_renditions = {}
+        profile.save(update_fields=['avatar', 'avatar_renditions'])
+        images.schedule(images.process_avatar, profile.pk)
+        return Response(ProfileSerializer(profile).data)
+
+    # Confirming the same token twice returns the work created the first time.
+    work, created = Work.objects.get_or_create(
+        user_id=request.user.pk, image=name, defaults={'title': data.get('title') or 'Untitled'}
+    )
+    if created:
+        images.schedule(images.process_work_image, work.pk)
+    return Response(WorkSerializer(work).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -66,11 +145,7 @@ def google_auth(request):
         if not google_client_id:
             return Response({'error': 'Google OAuth not configured'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        idinfo = id_token.verify_oauth2_token(
-            token, 
-            google_requests.Request(), 
-            google_client_id
-        )
+        idinfo = verify_google_id_token(token, google_client_id)
         
         # Get user info from token
         email = idinfo.get('email')
@@ -83,40 +158,45 @@ def google_auth(request):
         if not email:
             return Response({'error': 'Email not provided by Google'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Find or create user
-        user, created = User.objects.get_or_create(
-            email=email,
-            defaults={
-                'username': email.split('@')[0] + '_' + google_id[:8],
-                'first_name': given_name,
-                'last_name': family_name,
-            }
-        )
-        
-        # If user already exists with different auth method, update info
-        if not created:
-            user.first_name = given_name or user.first_name
-            user.last_name = family_name or user.last_name
-            user.save()
-        
-        # Ensure profile exists
-        profile, _ = Profile.objects.get_or_create(user=user)
-        if created and name:
-            profile.display_name = name
-            profile.save()
+        with transaction.atomic():
+            # Find or create user; the profile is joined into the lookup.
+            user, created = User.objects.select_related('profile').get_or_create(
+                email=email,
+                defaults={
+                    'username': email.split('@')[0] + '_' + google_id[:8],
+                    'first_name': given_name,
+                    'last_name': family_name,
+                }
+            )
+            
+            if created:
+                # The post_save signal created the profile and cached it on user.
+                if name:
+                    user.profile.display_name = name
+                    user.profile.save(update_fields=['display_name'])
+            else:
+                # If user already exists with different auth method, update info
+                updates = {'first_name': given_name, 'last_name': family_name}
+                changed = [field for field, value in updates.items() if value and getattr(user, field) != value]
+                for field in changed:
+                    setattr(user, field, updates[field])
+                if changed:
+                    user.save(update_fields=changed)
+                try:
+                    user.profile
+                except Profile.DoesNotExist:
+                    Profile.objects.create(user=user)
         
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = ArtFitRefreshToken.for_user(user)
         
         return Response({
-            'user': UserSerializer(user).data,
+            'user': UserSerializer(user, context={'works_preview': []} if created else {}).data,
             'access': str(refresh.access_token),
             'refresh': str(refresh),
             'is_new_user': created,
         }, status=status.HTTP_200_OK)
         
-    except ValueError as e:
-        # Invalid token
-        return Response({'error': f'Invalid token: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except (ValueError, GoogleAuthError):
+        # Expired, wrong audience, bad signature or malformed; don't echo the reason back.
+        return Response({'error': 'Invalid Google token'}, status=status.HTTP_400_BAD_REQUEST)
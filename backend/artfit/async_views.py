@@ -0,0 +1,130 @@
+"""Async read paths for ASGI deployments."""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from .renderers import ORJSONRenderer
+
+
+class AsyncReadMixin:
+    """Async list/retrieve for generic views; pair with async_read_view()."""
+
+    # Whether a GET holds a db_slots() slot throughout. Views that mostly wait
+    # between queries turn this off and take a slot around each query instead.
+    async_db_slot = True
+    # Set through as_view() by async_read_view() for the view serving GET.
+    async_read = False
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.async_read:
+            return self.adispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """
+        APIView.dispatch() with the two steps that query awaited: authentication,
+        and the a-prefixed handler in place of the sync one.
+        """
+        self.args, self.kwargs = args, kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await aauthenticate(request)
+            # request.user is set, so APIView.initial() authenticates from it without a query.
+            self.initial(request, *args, **kwargs)
+            await self.ainitial(request)
+            handler = getattr(self, "a" + self.action_map["get"]) if hasattr(self, "action_map") else self.aretrieve
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request):
+        """Runs after APIView.initial(), for checks that need to await."""
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.paginator is None:
+            objs = [obj async for obj in queryset]
+            return Response(self.get_serializer(objs, many=True).data)
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+async def aauthenticate(request):
+    """Request._authenticate() without blocking the event loop."""
+    for authenticator in request.authenticators:
+        try:
+            if hasattr(authenticator, "aauthenticate"):
+                user_auth = await authenticator.aauthenticate(request)
+            elif isinstance(authenticator, SessionAuthentication):
+                # GET is CSRF-safe, so the session user is all this check needs.
+                user = await request._request.auser()
+                user_auth = (user, None) if user.is_active else None
+            else:
+                user_auth = await sync_to_async(authenticator.authenticate)(request)
+        except APIException:
+            request._not_authenticated()
+            raise
+        if user_auth is not None:
+            request._authenticator = authenticator
+            request.user, request.auth = user_auth
+            return
+    request._not_authenticated()
+
+
+_db_slots = None
+
+def db_slots():
+    global _db_slots
+    if _db_slots is None:
+        _db_slots = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+    return _db_slots
+
+
+def async_read_view(view_class, actions=None):
+    """
+    Async Django view serving GET from view_class's async handler and every
+    other method from view_class.as_view(actions).
+    """
+    sync_view = view_class.as_view(actions) if actions else view_class.as_view()
+    # Only the JSON renderer: the browsable API renders forms that query synchronously.
+    read_kwargs = {"async_read": True, "renderer_classes": [ORJSONRenderer]}
+    read_view = view_class.as_view(actions, **read_kwargs) if actions else view_class.as_view(**read_kwargs)
+
+    async def view(request, *args, **kwargs):
+        if request.method == "GET" and not view_class.async_db_slot:
+            return await read(request, *args, **kwargs)
+        async with db_slots():
+            if request.method != "GET":
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            return await read(request, *args, **kwargs)
+
+    async def read(request, *args, **kwargs):
+        response = (await read_view(request, *args, **kwargs)).render()
+        # A plain HttpResponse, so the handler does not hop to a thread to render it again.
+        return HttpResponse(response.content, status=response.status_code, headers=dict(response.items()))
+
+    view.csrf_exempt = True
+    view.cls = view_class
+    return view
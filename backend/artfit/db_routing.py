@@ -0,0 +1,106 @@
+"""Read-replica routing that keeps a user's reads on the primary for a while after they write."""
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = "replica"
+PIN_KEY = "db:pinned:{}"
+
+class RoutingState:
+    __slots__ = ("replica", "wrote")
+
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+
+_state = ContextVar("artfit_db_routing", default=None)
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.replica and not state.wrote:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+class ReplicaReadMixin:
+    """Sends a view's safe-method reads to the replica unless the user is pinned to the primary."""
+
+    # Actions that fill a cache shared by every user. Views caching anonymous
+    # responses declare those actions as anonymous_cache_actions.
+    shared_cache_actions = ()
+
+    def fills_shared_cache(self, request):
+        if self.action in self.shared_cache_actions:
+            return True
+        return not request.user.is_authenticated and self.action in getattr(self, "anonymous_cache_actions", ())
+
+    def _replica_allowed(self, request):
+        return (REPLICA in settings.DATABASES and request.method in SAFE_METHODS
+                and not self.fills_shared_cache(request))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = _state.get()
+        # The async read path (artfit.async_views) decides in ainitial() instead.
+        if state is not None and not getattr(self, "async_read", False) and self._replica_allowed(request):
+            user = request.user
+            state.replica = not (user.is_authenticated and cache.get(PIN_KEY.format(user.pk)))
+
+    async def ainitial(self, request):
+        await super().ainitial(request)
+        state = _state.get()
+        if state is not None and self._replica_allowed(request):
+            user = request.user
+            state.replica = not (user.is_authenticated and await cache.aget(PIN_KEY.format(user.pk)))
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        # DRF sets the authenticated user on the underlying request too.
+        user = getattr(request, "user", None)
+        if state.wrote and user is not None and user.is_authenticated:
+            cache.set(PIN_KEY.format(user.pk), 1, settings.DB_REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        user = getattr(request, "user", None)
+        if state.wrote and user is not None and user.is_authenticated:
+            await cache.aset(PIN_KEY.format(user.pk), 1, settings.DB_REPLICA_PIN_SECONDS)
+        return response
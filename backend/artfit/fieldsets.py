@@ -0,0 +1,156 @@
+"""Sparse fieldsets: ?fields=, ?omit= and ?expand= on read requests."""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _names(request, param):
+    value = request.query_params.get(param)
+    return None if value is None else [name for name in (s.strip() for s in value.split(",")) if name]
+
+
+def _model_field(model, attrs):
+    """The model field a source path ends on, following forward foreign keys; None if it leaves them."""
+    field = None
+    for attr in attrs:
+        if field is not None:
+            if not (field.concrete and (field.many_to_one or field.one_to_one)):
+                return None
+            model = field.related_model
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+    return field
+
+
+def _loads(serializer, model, prefix=""):
+    """
+    (only() columns, select_related paths, prefetch lookups) for what the
+    readable fields of serializer read from model. columns is None when a
+    field reads something only() can't see, such as a method field.
+    """
+    columns, related, prefetched = [], [], []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        attrs = field.source_attrs
+        target = _model_field(model, attrs) if attrs else None
+        path = prefix + "__".join(attrs)
+        if target is None:
+            columns = None
+        elif target.many_to_many or target.one_to_many:
+            prefetched.append(path)
+        else:
+            parts = path.split("__")
+            related.extend("__".join(parts[:i]) for i in range(len(prefix.split("__")), len(parts)))
+            if columns is not None:
+                columns.append(path)
+            if isinstance(field, serializers.BaseSerializer):
+                related.append(path)
+                child_columns, child_related, child_prefetched = _loads(field, target.related_model, path + "__")
+                columns = None if columns is None or child_columns is None else columns + child_columns
+                related += child_related
+                prefetched += child_prefetched
+    return columns, related, prefetched
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer side of sparse fieldsets. Meta.expandable_fields maps a name to
+    (serializer class or dotted path, kwargs); the field is built read-only
+    when ?expand= names it, replacing a field of that name if there is one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is not None and request.method in SAFE_METHODS:
+            self.select_fields(*(_names(request, param) for param in ("fields", "omit", "expand")))
+
+    def select_fields(self, fields, omit, expand):
+        if fields is None and omit is None and expand is None:
+            return
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        readable = {name for name, field in self.fields.items() if not field.write_only}
+        errors = {}
+        for param, names, known in (("fields", fields, readable | expandable.keys()),
+                                    ("omit", omit, readable | expandable.keys()),
+                                    ("expand", expand, expandable.keys())):
+            unknown = [name for name in names or () if name not in known]
+            if unknown:
+                errors[param] = [f"Unknown field(s): {', '.join(unknown)}."]
+        if errors:
+            raise ValidationError(errors)
+        # Asking for an expand-only field by name expands it.
+        expanded = set(expand or ()) | (set(fields or ()) & (expandable.keys() - readable))
+        for name in expanded:
+            serializer_class, field_kwargs = expandable[name]
+            if isinstance(serializer_class, str):
+                serializer_class = import_string(serializer_class)
+            self.fields[name] = serializer_class(read_only=True, **field_kwargs)
+        keep = set(fields) if fields is not None else set(self.fields)
+        for name in list(self.fields):
+            if name not in keep or name in (omit or ()):
+                self.fields.pop(name)
+
+    def trim_queryset(self, queryset, extra=()):
+        """queryset loading only what the readable fields use; extra names more columns to load."""
+        columns, related, prefetched = _loads(self, queryset.model)
+        # Fields that hide what they read (source="*") keep the relations named after them.
+        roots = {field.source_attrs[0] if field.source_attrs else name
+                 for name, field in self.fields.items() if not field.write_only}
+
+        kept_related = [path for path in _select_paths(queryset.query.select_related) if path.split("__")[0] in roots]
+        queryset = queryset.select_related(None)
+        if kept_related or related:
+            queryset = queryset.select_related(*dict.fromkeys(kept_related + related))
+
+        lookups = [lookup for lookup in queryset._prefetch_related_lookups if _prefetch_root(lookup) in roots]
+        covered = {_prefetch_root(lookup) for lookup in lookups}
+        lookups += [path for path in prefetched if path.split("__")[0] not in covered]
+        queryset = queryset.prefetch_related(None).prefetch_related(*dict.fromkeys(lookups))
+
+        if columns is not None:
+            extra = [name for name in extra if _model_field(queryset.model, [name]) is not None]
+            queryset = queryset.only(*dict.fromkeys([*columns, *related, *extra]))
+        return queryset
+
+
+def _select_paths(selected, prefix=""):
+    if not isinstance(selected, dict):
+        return []
+    paths = []
+    for name, nested in selected.items():
+        paths.append(prefix + name)
+        paths.extend(_select_paths(nested, prefix + name + "__"))
+    return paths
+
+
+def _prefetch_root(lookup):
+    return (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup).split("__")[0]
+
+
+class SparseFieldsetViewMixin:
+    """View side of sparse fieldsets: querysets trimmed to the fields a SparseFieldsetMixin serializer keeps."""
+
+    def filter_queryset(self, queryset):
+        # Trimmed here rather than in get_queryset(), which views override; list and retrieve both filter.
+        queryset = super().filter_queryset(queryset)
+        serializer = self.sparse_serializer()
+        if serializer is None:
+            return queryset
+        return serializer.trim_queryset(queryset, self.sparse_ordering())
+
+    def sparse_serializer(self):
+        if self.request.method not in SAFE_METHODS:
+            return None
+        serializer = self.get_serializer()
+        return serializer if isinstance(serializer, SparseFieldsetMixin) else None
+
+    def sparse_ordering(self):
+        # The cursor paginator reads its position from the last row.
+        return [name.lstrip("-") for name in getattr(self.paginator, "ordering", None) or ()]
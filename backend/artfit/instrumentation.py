@@ -0,0 +1,157 @@
+"""Per-request SQL and timing instrumentation: Server-Timing, Prometheus metrics and slow/repeated query warnings."""
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+import prometheus_client
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = prometheus_client.Counter("artfit_requests", "HTTP requests.", ["view", "method", "status"])
+DURATION = prometheus_client.Histogram(
+    "artfit_request_duration_seconds", "Request duration.", ["view"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = prometheus_client.Counter("artfit_db_queries", "SQL queries.", ["view"])
+DB_TIME = prometheus_client.Counter("artfit_db_seconds", "Time spent in SQL queries.", ["view"])
+RENDER_TIME = prometheus_client.Counter("artfit_render_seconds", "Time spent rendering response bodies.", ["view"])
+RESPONSE_BYTES = prometheus_client.Counter("artfit_response_bytes", "Response body bytes.", ["view"])
+SLOW_QUERIES = prometheus_client.Counter("artfit_slow_queries", "Queries slower than SLOW_QUERY_MS.", ["view"])
+REPEATED_QUERIES = prometheus_client.Counter(
+    "artfit_repeated_query_requests", "Requests that ran one statement REPEATED_QUERY_THRESHOLD+ times.", ["view"]
+)
+
+_recorder = ContextVar("artfit_request_recorder", default=None)
+
+class RequestRecorder:
+    __slots__ = ("queries", "db_time", "render_time", "statements", "slow")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+        self.slow = []
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        recorder.queries += 1
+        recorder.db_time += elapsed
+        # Parameters are passed separately, so the same lookup repeated for N rows shares one key.
+        recorder.statements[sql] += 1
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            recorder.slow.append((elapsed, sql))
+
+def _add_query_wrapper(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+@contextmanager
+def rendering():
+    """Count the enclosed block toward the current request's render time."""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.render_time += time.perf_counter() - start
+
+def install():
+    """Hook query timing; safe to call more than once."""
+    connection_created.connect(_add_query_wrapper, dispatch_uid="artfit.instrumentation")
+    for connection in connections.all(initialized_only=True):
+        _add_query_wrapper(connection)
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        install()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder, start = RequestRecorder(), time.perf_counter()
+        token = _recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder, start = RequestRecorder(), time.perf_counter()
+        token = _recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, start)
+
+    def finish(self, request, response, recorder, start):
+        elapsed = time.perf_counter() - start
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unmatched"
+        size = 0 if response.streaming else len(response.content)
+
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        DURATION.labels(view).observe(elapsed)
+        DB_QUERIES.labels(view).inc(recorder.queries)
+        DB_TIME.labels(view).inc(recorder.db_time)
+        RENDER_TIME.labels(view).inc(recorder.render_time)
+        RESPONSE_BYTES.labels(view).inc(size)
+
+        for duration, sql in recorder.slow:
+            SLOW_QUERIES.labels(view).inc()
+            logger.warning("Slow query (%.0f ms) in %s %s: %s", duration * 1000, request.method, view, sql[:500])
+        repeated = [(sql, n) for sql, n in recorder.statements.items() if n >= settings.REPEATED_QUERY_THRESHOLD]
+        if repeated:
+            REPEATED_QUERIES.labels(view).inc()
+            for sql, n in repeated:
+                logger.warning("Query ran %d times in %s %s (N+1?): %s", n, request.method, view, sql[:500])
+
+        if settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = (
+                f'db;dur={recorder.db_time * 1000:.1f};desc="{recorder.queries} queries", '
+                f'render;dur={recorder.render_time * 1000:.1f}, '
+                f'app;dur={elapsed * 1000:.1f}'
+            )
+        return response
+
+def metrics_view(request):
+    """Prometheus text exposition; requires `Authorization: Bearer <METRICS_TOKEN>`, and is a 404 while that is unset."""
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=404)
+    if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return HttpResponse(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
@@ -0,0 +1,50 @@
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination
+
+
+class AsyncCursorPagination(CursorPagination):
+    """
+    CursorPagination that the async read views can await.
+    apaginate_queryset runs DRF's paginate_queryset in a worker thread, so
+    cursors are the same on both paths.
+    """
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        # marketplace.filters.CounterOrderingFilter annotates a unique sort_key; ?ordering= gives its direction.
+        if "sort_key" in queryset.query.annotations:
+            return ("-sort_key",) if request.query_params.get("ordering", "").startswith("-") else ("sort_key",)
+        return super().get_ordering(request, queryset, view)
+
+
+class CreatedAtCursorPagination(AsyncCursorPagination):
+    """
+    Keyset pagination over (-created_at, -id).
+    The cursor encodes the last created_at seen, so every page is an index
+    range scan on the (created_at, id) indexes instead of an OFFSET.
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-created_at", "-id")
+
+
+class NameCursorPagination(AsyncCursorPagination):
+    """Keyset pagination for tables without created_at, ordered by their unique name."""
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("name",)
+
+
+class RankedCursorPagination(CreatedAtCursorPagination):
+    """
+    Orders by an explicit counter ordering, else by relevance when a search
+    backend annotated search_rank, otherwise by recency.
+    """
+    def get_ordering(self, request, queryset, view):
+        annotations = queryset.query.annotations
+        if "search_rank" in annotations and "sort_key" not in annotations:
+            return ("-search_rank", "-id")
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,21 @@
+"""orjson-backed JSON rendering."""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from .instrumentation import rendering
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with rendering():
+            if self.get_indent(accepted_media_type or "", renderer_context or {}):
+                return super().render(data, accepted_media_type, renderer_context)
+            # JSONRenderer escapes these too, so the output is also valid JavaScript.
+            return orjson.dumps(data, default=_encoder.default, option=OPTIONS).replace(
+                b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
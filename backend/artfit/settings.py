@@ -12,14 +12,16 @@ ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "*").split(",")
 
 INSTALLED_APPS = [
     "django.contrib.admin","django.contrib.auth","django.contrib.contenttypes",
-    "django.contrib.sessions","django.contrib.messages","django.contrib.staticfiles",
+    "django.contrib.sessions","django.contrib.messages","django.contrib.staticfiles","django.contrib.postgres",
     "rest_framework","django_filters","corsheaders","storages","accounts.apps.AccountsConfig","marketplace",
 ]
 
 MIDDLEWARE = [
+    "artfit.instrumentation.InstrumentationMiddleware",
+    "artfit.db_routing.ReplicaRoutingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "artfit.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -28,7 +30,21 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Per-request SQL/timing instrumentation (artfit.instrumentation).
+# The Server-Timing header exposes DB timings to every client, so it is opt-in.
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "0") == "1"
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "200"))
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", "10"))
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>"; it is a 404 while this is empty.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 ROOT_URLCONF = "artfit.urls"
+# Serve GETs for projects, skills and /me/ from async views (artfit.async_views).
+# Only for ASGI servers; under WSGI the sync viewsets handle everything.
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "0") == "1"
+# Concurrent async-view requests per ASGI process, each holding one DB connection;
+# keep processes x this below Postgres max_connections.
+ASYNC_DB_CONCURRENCY = int(os.getenv("ASYNC_DB_CONCURRENCY", "16"))
 TEMPLATES = [{
     "BACKEND": "django.template.backends.django.DjangoTemplates",
     "DIRS": [], "APP_DIRS": True,
@@ -42,36 +58,101 @@ TEMPLATES = [{
 WSGI_APPLICATION = "artfit.wsgi.application"
 
 # Database configuration
+# With DB_POOL (the default) every alias gets a psycopg connection pool per
+# process, shared by all its threads, so ASGI requests and sync workers reuse
+# connections instead of reconnecting; connections are health-checked when
+# taken from the pool. DB_POOL_MAX_SIZE bounds the connections per process.
+# Without a pool, sync workers keep persistent connections (checked before reuse).
+DB_POOL = os.getenv("DB_POOL", "1") == "1"
+DB_POOL_OPTIONS = {
+    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", str(ASYNC_DB_CONCURRENCY))),
+    # Seconds a request waits for a free connection before failing.
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+}
+
+def database(url=None, **fields):
+    db = dj_database_url.parse(url, ssl_require=True) if url else {"ENGINE": "django.db.backends.postgresql", **fields}
+    db["CONN_HEALTH_CHECKS"] = True
+    if DB_POOL:
+        db["CONN_MAX_AGE"] = 0
+        db.setdefault("OPTIONS", {})["pool"] = dict(DB_POOL_OPTIONS)
+    else:
+        # Persistent connections do not carry over between ASGI requests, which each run in their own thread.
+        db["CONN_MAX_AGE"] = 0 if ASYNC_READ_VIEWS else 600
+    return db
+
 # Use DATABASE_URL if available (Render provides this), otherwise use individual variables
 DATABASE_URL = os.getenv("DATABASE_URL")
-if DATABASE_URL:
-    DATABASES = {
-        "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600, ssl_require=True)
-    }
+DB_FIELDS = {
+    "NAME": os.getenv("DB_NAME", "artfit"),
+    "USER": os.getenv("DB_USER", "artfit"),
+    "PASSWORD": os.getenv("DB_PASSWORD", "artfit"),
+    "HOST": os.getenv("DB_HOST", "localhost"),
+    "PORT": os.getenv("DB_PORT", "5432"),
+}
+DATABASES = {"default": database(DATABASE_URL) if DATABASE_URL else database(**DB_FIELDS)}
+
+# Optional read replica for anonymous-heavy browse traffic (artfit.db_routing).
+# DATABASE_REPLICA_URL, or DB_REPLICA_HOST/DB_REPLICA_PORT with the DB_* credentials;
+# pointing it at the primary's own host gives a same-server stand-in for local testing.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+if DATABASE_REPLICA_URL or DB_REPLICA_HOST:
+    replica = database(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else database(
+        **{**DB_FIELDS, "HOST": DB_REPLICA_HOST, "PORT": os.getenv("DB_REPLICA_PORT", DB_FIELDS["PORT"])}
+    )
+    # Writes that reach the replica fail loudly, on a real standby and on the stand-in alike.
+    replica.setdefault("OPTIONS", {})["options"] = "-c default_transaction_read_only=on"
+    replica["TEST"] = {"MIRROR": "default"}
+    DATABASES["replica"] = replica
+DATABASE_ROUTERS = ["artfit.db_routing.ReplicaRouter"]
+# How long after a write a user's reads stay on the primary, to cover replication lag.
+DB_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "10"))
+
+# Shared cache: Redis when REDIS_URL is set, otherwise per-process memory (dev/tests).
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}}
 else:
-    DATABASES = {
-        "default":{
-            "ENGINE":"django.db.backends.postgresql",
-            "NAME": os.getenv("DB_NAME", "artfit"),
-            "USER": os.getenv("DB_USER", "artfit"),
-            "PASSWORD": os.getenv("DB_PASSWORD", "artfit"),
-            "HOST": os.getenv("DB_HOST", "localhost"),
-            "PORT": os.getenv("DB_PORT", "5432"),
-        }
-    }
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 AUTH_USER_MODEL = "accounts.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ClaimsJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "artfit.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PAGINATION_CLASS": "artfit.pagination.CreatedAtCursorPagination",
+    "PAGE_SIZE": 20,
+}
+
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.authentication.ArtFitTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.authentication.ArtFitTokenRefreshSerializer",
 }
+# How long ClaimsJWTAuthentication trusts a cached active/password state per user.
+AUTH_STATE_CACHE_TTL = int(os.getenv("AUTH_STATE_CACHE_TTL", "30"))
+
+# GET /api/events/ long-polls (marketplace.events; async views only): the longest ?wait= honoured, how often a waiting
+# request checks the cache for new events, and how often it asks Postgres regardless (the wakeups only
+# reach other processes through a shared cache). drain_outbox deletes events older than the retention.
+EVENTS_MAX_WAIT = int(os.getenv("EVENTS_MAX_WAIT", "25"))
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "0.5"))
+EVENTS_DB_RECHECK = float(os.getenv("EVENTS_DB_RECHECK", "5"))
+EVENTS_RETENTION_DAYS = int(os.getenv("EVENTS_RETENTION_DAYS", "7"))
+
+# Google ID-token signing certs (accounts.google); override to point at a local fake.
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
 
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "").split(",") if os.getenv("CORS_ALLOWED_ORIGINS") else []
 
@@ -84,7 +165,18 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = "static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# Django 5.1+ only reads STORAGES (DEFAULT_FILE_STORAGE/STATICFILES_STORAGE were removed).
+STORAGES = {
+    "default": {"BACKEND": "artfit.storage.MediaFileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
+
+# Avatar/work uploads (accounts.uploads) are rejected past these limits.
+MAX_IMAGE_UPLOAD_SIZE = int(os.getenv("MAX_IMAGE_UPLOAD_SIZE", str(10 * 1024 * 1024)))
+MAX_IMAGE_DIMENSION = int(os.getenv("MAX_IMAGE_DIMENSION", "8000"))
+
+# Thread pool size for avatar/work renditions (accounts.images); 0 runs them inline.
+IMAGE_PIPELINE_WORKERS = int(os.getenv("IMAGE_PIPELINE_WORKERS", "2"))
 
 # AWS S3 Configuration for Media Files
 USE_S3 = os.getenv("USE_S3", "False") == "True"
@@ -95,17 +187,26 @@ if USE_S3:
     AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
     AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME")
     AWS_S3_REGION_NAME = os.getenv("AWS_S3_REGION_NAME", "us-east-1")
+    # Point at an S3-compatible stand-in (e.g. MinIO) for local direct-upload testing.
+    AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL") or None
     AWS_S3_CUSTOM_DOMAIN = f"{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com"
+    # Private objects behind presigned URLs, each reused for AWS_QUERYSTRING_EXPIRE (artfit.storage).
+    MEDIA_SIGNED_URLS = os.getenv("MEDIA_SIGNED_URLS", "0") == "1"
+    AWS_QUERYSTRING_AUTH = MEDIA_SIGNED_URLS
+    AWS_QUERYSTRING_EXPIRE = int(os.getenv("AWS_QUERYSTRING_EXPIRE", "3600"))
+    AWS_DEFAULT_ACL = None if MEDIA_SIGNED_URLS else "public-read"
+    if MEDIA_SIGNED_URLS:
+        # Presigned URLs point at the bucket endpoint, not the custom domain.
+        AWS_S3_CUSTOM_DOMAIN = None
+    # Keys are never rewritten (content-hashed or unique, see artfit.storage), so caches can keep them for good.
     AWS_S3_OBJECT_PARAMETERS = {
-        "CacheControl": "max-age=86400",
+        "CacheControl": f"{'private' if MEDIA_SIGNED_URLS else 'public'}, max-age=31536000, immutable",
     }
-    AWS_DEFAULT_ACL = "public-read"
-    AWS_QUERYSTRING_AUTH = False
     AWS_S3_FILE_OVERWRITE = False
     
     # S3 Media settings
-    DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
-    MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/"
+    STORAGES["default"] = {"BACKEND": "artfit.storage.MediaS3Storage"}
+    MEDIA_URL = f"https://{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/"
 else:
     # Local media storage for development
     MEDIA_URL = "/media/"
@@ -0,0 +1,110 @@
+"""Media storage with content-addressed keys and memoized URLs."""
+import hashlib
+import os
+import time
+from django.core.exceptions import SuspiciousFileOperation, SuspiciousOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name, safe_join
+
+HASH_LENGTH = 16
+URL_CACHE_SIZE = 8192
+
+
+def content_digest(content):
+    """
+    Hex sha256 of a File: its own ``sha256`` attribute when whoever built it
+    already hashed the bytes, else hashed from the file without holding it
+    in memory (in-memory files are hashed in place).
+    """
+    digest = getattr(content, "sha256", None)
+    if digest is not None:
+        return digest
+    content.seek(0)
+    try:
+        digest = hashlib.file_digest(content.file, "sha256")
+    except (AttributeError, ValueError):
+        # Not a binary file object (e.g. a text stream); File.chunks() still reads it in pieces.
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ImmutableStorageMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # name -> URL for the current url_window(); replaced when the window moves on or it fills up.
+        self._urls, self._urls_window = {}, None
+
+    def hashed_name(self, name, content, max_length=None):
+        dir_name, file_name = os.path.split(str(name).replace("\\", "/"))
+        stem, ext = os.path.splitext(file_name)
+        suffix = f".{content_digest(content)[:HASH_LENGTH]}{ext}"
+        if max_length is not None:
+            # Trim the original stem, never the hash, to fit the field.
+            stem = stem[:max(max_length - len(os.path.join(dir_name, suffix)), 0)]
+            if not stem:
+                raise SuspiciousFileOperation(f'Storage can not fit a hashed name for "{name}" in {max_length} characters.')
+        return os.path.join(dir_name, stem + suffix)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+        name = self.hashed_name(name, content, max_length)
+        # A hashed key only ever holds these bytes, so if it exists it's this file.
+        if self.exists(name):
+            return name
+        name = self._save(name, content)
+        validate_file_name(name, allow_relative_path=True)
+        return name
+
+    def url(self, name, *args, **kwargs):
+        if args or kwargs:
+            return super().url(name, *args, **kwargs)
+        window = self.url_window()
+        if window != self._urls_window or len(self._urls) >= URL_CACHE_SIZE:
+            self._urls, self._urls_window = {}, window
+        url = self._urls.get(name)
+        if url is None:
+            url = self._urls[name] = super().url(name, **self.url_params())
+        return url
+
+    def url_window(self):
+        """Memoized URLs are reused until this changes; None while a name's URL never does."""
+        return None
+
+    def url_params(self):
+        """Keyword arguments for the backend's url() when a URL is built for the memo."""
+        return {}
+
+
+class MediaFileSystemStorage(ImmutableStorageMixin, FileSystemStorage):
+    pass
+
+
+class MediaS3Storage(ImmutableStorageMixin, S3Boto3Storage):
+    def object_key(self, name):
+        """The bucket key behind a storage name, for code that talks to the S3 client directly."""
+        try:
+            return safe_join(self.location, clean_name(name))
+        except ValueError:
+            raise SuspiciousOperation(f"Attempted access to '{name}' denied.")
+
+    def url_window(self):
+        if not self.querystring_auth:
+            return None
+        return int(time.time() // self.querystring_expire)
+
+    def url_params(self):
+        if not self.querystring_auth:
+            return {}
+        # Valid for a window past the one it's handed out in, so every URL has
+        # at least AWS_QUERYSTRING_EXPIRE left whenever it's served.
+        return {"expire": 2 * self.querystring_expire}
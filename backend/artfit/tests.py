@@ -0,0 +1,92 @@
+import os
+import tempfile
+from io import BytesIO
+from unittest import mock
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile, File
+from django.test import SimpleTestCase, override_settings
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APITestCase
+from .parsers import NDJSONParser
+from .storage import HASH_LENGTH, MediaFileSystemStorage, content_digest
+
+class InstrumentationTests(APITestCase):
+    def test_metrics_are_hidden_without_a_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_require_the_token(self):
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"artfit_render_seconds", response.content)
+
+    def test_server_timing_is_off_by_default(self):
+        self.assertNotIn("Server-Timing", self.client.get("/api/skills/"))
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_reports_render_time(self):
+        self.assertRegex(self.client.get("/api/skills/")["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", render;dur=[\d.]+, app;dur=')
+
+class NDJSONParserTests(SimpleTestCase):
+    def test_rows_are_parsed_lazily_with_bad_lines_reported_in_place(self):
+        stream = BytesIO(b'{"a": 1}\n\n  \n[2]\n{oops\n"last"')
+        rows = NDJSONParser().parse(stream)
+        self.assertEqual(next(rows), {"a": 1})
+        self.assertLess(stream.tell(), len(stream.getvalue()))
+        rest = list(rows)
+        self.assertEqual(rest[0], [2])
+        self.assertIsInstance(rest[1], ParseError)
+        self.assertTrue(str(rest[1].detail).startswith("Line 5: "))
+        self.assertEqual(rest[2], "last")
+
+    def test_empty_body(self):
+        self.assertEqual(list(NDJSONParser().parse(None)), [])
+
+class ReadOnlyStream:
+    """A binary stream without readinto(), which hashlib.file_digest needs."""
+    def __init__(self, data):
+        self._buffer = BytesIO(data)
+        self.read, self.seek, self.tell = self._buffer.read, self._buffer.seek, self._buffer.tell
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.storage = MediaFileSystemStorage(location=tmp.name, base_url="/media/")
+
+    def test_names_carry_the_content_hash(self):
+        name = self.storage.save("works/cat.png", ContentFile(b"cat"))
+        self.assertRegex(name, rf"^works/cat\.[0-9a-f]{{{HASH_LENGTH}}}\.png$")
+        self.assertNotEqual(self.storage.save("works/cat.png", ContentFile(b"dog")), name)
+
+    def test_same_bytes_are_stored_once(self):
+        first = self.storage.save("works/a.png", ContentFile(b"same"))
+        with mock.patch.object(MediaFileSystemStorage, "_save") as save:
+            self.assertEqual(self.storage.save("works/a.png", ContentFile(b"same")), first)
+        save.assert_not_called()
+        self.assertEqual(os.listdir(self.storage.path("works")), [os.path.basename(first)])
+
+    def test_digest_sources_agree(self):
+        expected = content_digest(ContentFile(b"bytes"))
+        self.assertEqual(content_digest(File(BytesIO(b"bytes"))), expected)
+        self.assertEqual(content_digest(File(ReadOnlyStream(b"bytes"))), expected)
+        reused = ContentFile(b"ignored")
+        reused.sha256 = expected
+        self.assertEqual(content_digest(reused), expected)
+
+    def test_max_length_trims_the_stem_not_the_hash(self):
+        name = self.storage.save("works/" + "x" * 50 + ".png", ContentFile(b"long"), max_length=40)
+        self.assertEqual(len(name), 40)
+        with self.assertRaises(SuspiciousFileOperation):
+            self.storage.save("works/cat.png", ContentFile(b"short"), max_length=20)
+
+    def test_urls_are_memoized_per_window(self):
+        with mock.patch.object(MediaFileSystemStorage, "url_window", return_value=1), \
+                mock.patch("django.core.files.storage.FileSystemStorage.url", side_effect=lambda name: f"/media/{name}") as url:
+            self.storage.url("a.png")
+            self.storage.url("a.png")
+            self.assertEqual(url.call_count, 1)
+            MediaFileSystemStorage.url_window.return_value = 2
+            self.assertEqual(self.storage.url("a.png"), "/media/a.png")
+            self.assertEqual(url.call_count, 2)
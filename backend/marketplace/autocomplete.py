@@ -0,0 +1,151 @@
+"""Skill tag autocomplete from a per-process prefix index that follows tag changes through a change log."""
+import copy
+import threading
+import time
+from bisect import insort
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from .models import SkillTag
+
+MAX_RESULTS = 10
+REFRESH_SECONDS = 60 * 10
+VERSION_KEY = "autocomplete:version"
+# How far behind an index may be and still catch up from the change log.
+CHANGE_LOG_VERSIONS = 1000
+CHANGE_LOG_TTL = 60 * 60
+TAG_FIELDS = ("id", "name", "kind", "project_count")
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+async def _aversion():
+    return await cache.aget_or_set(VERSION_KEY, 1, None)
+
+def _changes_key(version):
+    return f"autocomplete:changes:{version}"
+
+def bump_version(tag_ids=None):
+    """
+    Move every process's index on. Indexes re-read just ``tag_ids`` and
+    update those tags' entries; None (e.g. after bulk writes) makes them rebuild.
+    """
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+        return
+    if tag_ids is not None:
+        cache.set(_changes_key(version), sorted(tag_ids), CHANGE_LOG_TTL)
+
+def tags_changed(tag_ids):
+    """Bump the version for these tags once the current transaction commits."""
+    ids = set(tag_ids)
+    transaction.on_commit(lambda: bump_version(ids))
+
+def normalize(text):
+    return " ".join(text.casefold().split())
+
+def _prefixes(name):
+    name = normalize(name)
+    prefixes = {""}
+    for start in (i for i, ch in enumerate(name) if ch.isalnum() and (i == 0 or not name[i - 1].isalnum())):
+        prefixes.update(name[start:end] for end in range(start + 1, len(name) + 1))
+    return prefixes
+
+def _rank(entry):
+    return entry[0]
+
+class SkillTagPrefixIndex:
+    """(kind or None, prefix) -> every matching tag as (rank, payload), most popular first."""
+
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.tags = {}
+        self.entries = {}
+        # Appended most popular first, so every list starts out in rank order.
+        rows = sorted(SkillTag.objects.values_list(*TAG_FIELDS), key=lambda row: (-row[3], row[1]))
+        for row in rows:
+            tag, entry = self._entry(row)
+            for key in self._keys(tag):
+                self.entries.setdefault(key, []).append(entry)
+
+    def _entry(self, row):
+        pk, name, kind, project_count = row
+        tag = self.tags[pk] = {"id": pk, "name": name, "kind": kind}
+        return tag, ((-project_count, name), tag)
+
+    def _keys(self, tag):
+        for prefix in _prefixes(tag["name"]):
+            yield None, prefix
+            yield tag["kind"], prefix
+
+    # _add and _remove replace the lists they change instead of editing them:
+    # an updated() copy shares every other list with the index it came from.
+
+    def _add(self, row):
+        tag, entry = self._entry(row)
+        for key in self._keys(tag):
+            matches = list(self.entries.get(key, ()))
+            insort(matches, entry, key=_rank)
+            self.entries[key] = matches
+
+    def _remove(self, pk):
+        tag = self.tags.pop(pk, None)
+        if tag is None:
+            return
+        for key in self._keys(tag):
+            matches = [entry for entry in self.entries[key] if entry[1] is not tag]
+            if matches:
+                self.entries[key] = matches
+            else:
+                del self.entries[key]
+
+    def is_stale(self, version):
+        return version != self.version or time.monotonic() - self.built_at > REFRESH_SECONDS
+
+    def updated(self, version):
+        """
+        A copy caught up to ``version`` from the change log, or None when it
+        has to be rebuilt: the log has a gap, or REFRESH_SECONDS have passed
+        and every tag's popularity is due a re-read anyway.
+        """
+        if time.monotonic() - self.built_at > REFRESH_SECONDS:
+            return None
+        if not self.version < version <= self.version + CHANGE_LOG_VERSIONS:
+            return None
+        keys = [_changes_key(v) for v in range(self.version + 1, version + 1)]
+        logged = cache.get_many(keys)
+        if len(logged) != len(keys):
+            return None
+        changed = set().union(*logged.values())
+        index = copy.copy(self)
+        index.version, index.tags, index.entries = version, dict(self.tags), dict(self.entries)
+        for pk in changed:
+            index._remove(pk)
+        for row in SkillTag.objects.filter(pk__in=changed).values_list(*TAG_FIELDS):
+            index._add(row)
+        return index
+
+    def lookup(self, query, kind=None, limit=MAX_RESULTS):
+        return [tag for _, tag in self.entries.get((kind, normalize(query)), [])[:limit]]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Return this process's SkillTagPrefixIndex, catching it up (or rebuilding it) if it is stale."""
+    global _index
+    version = _version()
+    if _index is None or _index.is_stale(version):
+        with _index_lock:
+            if _index is None or _index.is_stale(version):
+                _index = (_index and _index.updated(version)) or SkillTagPrefixIndex(version)
+    return _index
+
+async def aget_index():
+    version = await _aversion()
+    if _index is None or _index.is_stale(version):
+        return await sync_to_async(get_index)()
+    return _index
@@ -0,0 +1,126 @@
+"""Shared-cache responses for anonymous reads, invalidated through versioned cache tags."""
+import hashlib
+import time
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from artfit.renderers import ORJSONRenderer
+
+RESPONSE_CACHE_TIMEOUT = 60 * 5
+TAG_KEY = "respcache:tag:{}"
+# Tag versions outlive every entry keyed on them; one that expires is reseeded from the clock.
+TAG_TIMEOUT = RESPONSE_CACHE_TIMEOUT * 2
+
+def _tag_versions(tags):
+    keys = [TAG_KEY.format(t) for t in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed from the clock so an evicted tag never reuses an old version.
+            cache.add(key, time.time_ns(), TAG_TIMEOUT)
+            versions[key] = cache.get(key)
+    return [versions[k] for k in keys]
+
+async def _atag_versions(tags):
+    keys = [TAG_KEY.format(t) for t in tags]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, time.time_ns(), TAG_TIMEOUT)
+            versions[key] = await cache.aget(key)
+    return [versions[k] for k in keys]
+
+def invalidate_tags(*tags):
+    for tag in tags:
+        try:
+            cache.incr(TAG_KEY.format(tag))
+        except ValueError:
+            cache.set(TAG_KEY.format(tag), time.time_ns(), TAG_TIMEOUT)
+
+def _cache_key(request, tags, versions):
+    authenticator = type(request.successful_authenticator).__name__ if request.successful_authenticator else "anon"
+    params = sorted(request.query_params.lists())
+    # Bodies embed absolute next/previous links, so the host and scheme are part of the response.
+    raw = repr((request.method, request.scheme, request.get_host(), request.path, params, authenticator,
+                list(zip(tags, versions))))
+    return "respcache:" + hashlib.sha1(raw.encode()).hexdigest()
+
+def response_cache_key(request, tags):
+    return _cache_key(request, tags, _tag_versions(tags))
+
+async def aresponse_cache_key(request, tags):
+    return _cache_key(request, tags, await _atag_versions(tags))
+
+class AnonymousResponseCacheMixin:
+    """Caches list/retrieve for anonymous users; views declare the tags their payloads depend on in cache_tags."""
+    cache_timeout = RESPONSE_CACHE_TIMEOUT
+    cache_tags = None
+    # Read by artfit.db_routing, which keeps the queries behind shared entries off the replica.
+    anonymous_cache_actions = ("list", "retrieve")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # A view without tags would serve its cached responses until they expire.
+        if not cls.cache_tags:
+            raise ImproperlyConfigured(f"{cls.__name__} must set cache_tags.")
+
+    def get_cache_tags(self):
+        return list(self.cache_tags)
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._acached_response(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._acached_response(super().aretrieve, request, *args, **kwargs)
+
+    def _cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = response_cache_key(request, self.get_cache_tags())
+        entry = cache.get(key)
+        response = None
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = (self._etag(response.data), response.data)
+            cache.set(key, entry, self.cache_timeout)
+        return self._conditional_response(request, entry, response)
+
+    async def _acached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return await handler(request, *args, **kwargs)
+        key = await aresponse_cache_key(request, self.get_cache_tags())
+        entry = await cache.aget(key)
+        response = None
+        if entry is None:
+            response = await handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = (self._etag(response.data), response.data)
+            await cache.aset(key, entry, self.cache_timeout)
+        return self._conditional_response(request, entry, response)
+
+    @staticmethod
+    def _etag(data):
+        return '"%s"' % hashlib.md5(ORJSONRenderer().render(data)).hexdigest()
+
+    def _conditional_response(self, request, entry, response):
+        etag, data = entry
+        client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in client_etags or "*" in client_etags:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif response is None:
+            response = Response(data)
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Authorization", "Cookie"])
+        return response
@@ -0,0 +1,81 @@
+"""Per-user event delivery through a transactional outbox."""
+import asyncio, time
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from accounts.models import User
+from .models import OutboxEvent, Notification, Proposal
+
+LATEST_KEY = "events:latest:{}"
+LATEST_TTL = 60 * 60 * 24
+MAX_RESULTS = 100
+# Payloads carry ids only:
+#   proposal.created  proposal, project, submitter, project_owner    -> the project owner
+#   proposal.status   proposal, project, submitter, previous, status  -> the submitter
+#   project.closed    project, owner                                  -> everyone with a proposal on the project
+# Payload field naming the recipient, for the kinds that have exactly one.
+RECIPIENT_FIELDS = {"proposal.created": "project_owner", "proposal.status": "submitter"}
+
+def record(kind, **payload):
+    OutboxEvent.objects.create(kind=kind, payload=payload)
+
+def drain(batch_size=500):
+    """Deliver up to batch_size outbox events; returns how many were drained."""
+    with transaction.atomic():
+        # SKIP LOCKED lets several workers drain side by side.
+        batch = list(OutboxEvent.objects.select_for_update(skip_locked=True).order_by("id")[:batch_size])
+        if not batch:
+            return 0
+        closed = {event.payload["project"] for event in batch if event.kind == "project.closed"}
+        submitters = {}
+        for project_id, submitter_id in Proposal.objects.filter(project_id__in=closed).values_list("project_id", "submitter_id"):
+            submitters.setdefault(project_id, []).append(submitter_id)
+        recipients = [
+            (event, [event.payload[RECIPIENT_FIELDS[event.kind]]] if event.kind in RECIPIENT_FIELDS
+             else submitters.get(event.payload["project"], []))
+            for event in batch
+        ]
+        # Users deleted since the event was written would fail the foreign key.
+        existing = set(User.objects.filter(pk__in={pk for _, users in recipients for pk in users}).values_list("pk", flat=True))
+        notifications = Notification.objects.bulk_create([
+            Notification(user_id=user_id, kind=event.kind, payload=event.payload, created_at=event.created_at)
+            for event, users in recipients for user_id in users if user_id in existing
+        ])
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in batch]).delete()
+    latest = {}
+    for notification in notifications:
+        latest[LATEST_KEY.format(notification.user_id)] = notification.pk
+    cache.set_many(latest, LATEST_TTL)
+    return len(batch)
+
+def prune():
+    """Delete notifications older than EVENTS_RETENTION_DAYS."""
+    cutoff = timezone.now() - timedelta(days=settings.EVENTS_RETENTION_DAYS)
+    return Notification.objects.filter(created_at__lt=cutoff).delete()[0]
+
+def after(user_id, cursor):
+    """The user's notifications after cursor, oldest first, at most MAX_RESULTS of them."""
+    return Notification.objects.filter(user_id=user_id, id__gt=cursor).order_by("id")[:MAX_RESULTS]
+
+async def apoll(user_id, cursor, timeout, slots):
+    """
+    after(), waiting up to timeout seconds for the first notification; slots
+    bounds the concurrent queries (see artfit.async_views.db_slots).
+    """
+    deadline = time.monotonic() + timeout
+    seen, recheck_at = object(), 0
+    while True:
+        latest = await cache.aget(LATEST_KEY.format(user_id))
+        if latest != seen or time.monotonic() >= recheck_at:
+            seen, recheck_at = latest, time.monotonic() + settings.EVENTS_DB_RECHECK
+            async with slots:
+                notifications = [n async for n in after(user_id, cursor)]
+                await sync_to_async(close_old_connections)()
+            if notifications:
+                return notifications
+        if time.monotonic() >= deadline:
+            return []
+        await asyncio.sleep(min(settings.EVENTS_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
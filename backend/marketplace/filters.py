@@ -0,0 +1,71 @@
+from django import forms
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+import django_filters
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from .models import SEARCH_CONFIG, SkillTag, Project, counter_sort_key
+
+class ProjectSearchFilter(filters.SearchFilter):
+    """
+    Full-text search over Project.search_vector (GIN indexed).
+    Matches are annotated with search_rank so the paginator can order by relevance.
+    """
+    def filter_queryset(self, request, queryset, view):
+        terms = " ".join(self.get_search_terms(request))
+        if not terms:
+            return queryset
+        query = SearchQuery(terms, config=SEARCH_CONFIG, search_type="websearch")
+        # Cast to double precision so the rank round-trips exactly through the cursor.
+        rank = Cast(SearchRank(F("search_vector"), query), output_field=FloatField())
+        return queryset.filter(search_vector=query).annotate(search_rank=rank)
+
+class CounterOrderingFilter(filters.BaseFilterBackend):
+    """
+    ?ordering=<field> or ?ordering=-<field> for a denormalized counter listed
+    in the view's counter_ordering_fields. Annotates the unique, expression
+    indexed sort_key (see counter_sort_key) that AsyncCursorPagination seeks on.
+    """
+    ordering_param = "ordering"
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_param)
+        if not ordering:
+            return queryset
+        fields = getattr(view, "counter_ordering_fields", [])
+        if ordering.lstrip("-") not in fields:
+            choices = ", ".join(f"{field}, -{field}" for field in fields)
+            raise ValidationError({self.ordering_param: [f"Expected one of: {choices}."]})
+        return queryset.annotate(sort_key=counter_sort_key(ordering.lstrip("-")))
+
+class IntegerInFilter(django_filters.BaseInFilter):
+    field_class = forms.IntegerField
+
+class ProjectFilter(django_filters.FilterSet):
+    """
+    ?status=, ?looking_for_role=, ?budget_min__gte= (and __lte, and the same
+    for budget_max), ?tags=1,2 (any of those tags) and ?kind= (any tag of that
+    kind). Tag filters are array overlaps on Project.tag_array, which is GIN
+    indexed. No filter queries the database while validating, so the FilterSet
+    also runs on the async read path.
+    """
+    tags = IntegerInFilter(field_name="tag_array", method="filter_tags")
+    kind = django_filters.ChoiceFilter(choices=SkillTag.KIND_CHOICES, method="filter_kind")
+
+    class Meta:
+        model = Project
+        fields = {
+            "status": ["exact"],
+            "looking_for_role": ["exact"],
+            "budget_min": ["gte", "lte"],
+            "budget_max": ["gte", "lte"],
+        }
+
+    def filter_tags(self, queryset, name, value):
+        return queryset.filter(tag_array__overlap=value)
+
+    def filter_kind(self, queryset, name, value):
+        # ARRAY(SELECT id ...) is evaluated once, as an InitPlan, so the overlap can still use the GIN index.
+        return queryset.filter(tag_array__overlap=ArraySubquery(SkillTag.objects.filter(kind=value).values("id")))
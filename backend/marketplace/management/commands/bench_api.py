@@ -0,0 +1,205 @@
+"""API benchmark scenarios against the configured database (seed it with seed_bench)."""
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import time
+import uuid
+from datetime import datetime, timezone
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from accounts.authentication import ArtFitRefreshToken
+from accounts.models import User
+from .seed_bench import PASSWORD, USER_PREFIX, Command as SeedCommand
+
+SEARCH_TERMS = ["game", "figma", "react dashboard", "minimalist", "mobile app", "music -video"]
+REGISTER_PREFIX = "bench_reg_"
+# What a project list card shows.
+CARD_FIELDS = "id,title,status,budget_min,budget_max,looking_for_role,tags,proposal_count"
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return None
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if platform.system() == "Darwin" else peak / 2**10
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Command(BaseCommand):
+    help = "Run the API benchmark scenarios and report latency, queries per request and RSS as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenarios", help="Comma-separated subset of: " + ", ".join(self.scenarios()))
+        parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario.")
+        parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per scenario.")
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+        parser.add_argument("--baseline", help="Earlier report to compare against.")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Allowed relative p95 slowdown against the baseline (default 0.25).")
+
+    def scenarios(self):
+        return {
+            "projects_list": self.projects_list,
+            "projects_search": self.projects_search,
+            "projects_cards": self.projects_cards,
+            "proposals": self.proposals,
+            "proposals_inbox": self.proposals_inbox,
+            "proposals_outbox": self.proposals_outbox,
+            "me": self.me,
+            "me_sparse": self.me_sparse,
+            "register": self.register,
+            "login": self.login,
+        }
+
+    # Each scenario issues request number i and returns (response, expected status).
+    def projects_list(self, i):
+        return self.client.get("/api/projects/"), 200
+
+    def projects_search(self, i):
+        return self.client.get("/api/projects/", {"search": SEARCH_TERMS[i % len(SEARCH_TERMS)]}), 200
+
+    def projects_cards(self, i):
+        return self.client.get("/api/projects/", {"fields": CARD_FIELDS}), 200
+
+    def proposals(self, i):
+        return self.client.get("/api/proposals/"), 200
+
+    def proposals_inbox(self, i):
+        return self.client.get("/api/proposals/", {"box": "inbox"}), 200
+
+    def proposals_outbox(self, i):
+        return self.client.get("/api/proposals/", {"box": "outbox"}), 200
+
+    def me(self, i):
+        return self.client.get("/api/accounts/me/"), 200
+
+    def me_sparse(self, i):
+        return self.client.get("/api/accounts/me/", {"fields": "id,username,role,profile"}), 200
+
+    def register(self, i):
+        name = f"{REGISTER_PREFIX}{self.run_id}_{i}"
+        return self.anon.post("/api/accounts/register/", {
+            "username": name, "email": f"{name}@example.com", "password": PASSWORD, "role": "BOTH",
+        }, format="json"), 201
+
+    def login(self, i):
+        return self.anon.post("/api/token/", {"username": self.user.username, "password": PASSWORD}, format="json"), 200
+
+    def handle(self, *args, **options):
+        available = self.scenarios()
+        names = options["scenarios"].split(",") if options["scenarios"] else list(available)
+        unknown = set(names) - set(available)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if options["requests"] < 2:
+            raise CommandError("--requests must be at least 2.")
+        # The most active bench user: owns projects and has sent proposals.
+        self.user = User.objects.filter(username=f"{USER_PREFIX}0").first()
+        if self.user is None:
+            raise CommandError("No bench data; run `manage.py seed_bench` first.")
+        self.run_id = uuid.uuid4().hex[:8]
+        # Authenticated requests bypass the anonymous response cache, so they measure the real work.
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {ArtFitRefreshToken.for_user(self.user).access_token}")
+        self.anon = APIClient()
+
+        report = {
+            "meta": {
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "git_revision": _git_revision(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": f"{connection.vendor} {getattr(connection, 'pg_version', '')}".strip(),
+                "requests": options["requests"],
+                "rows": SeedCommand().counts(),
+            },
+            "scenarios": {},
+        }
+        try:
+            for name in names:
+                result = self.run(available[name], options["warmup"], options["requests"])
+                report["scenarios"][name] = result
+                self.stderr.write(
+                    f"{name:16s} p50={result['p50_ms']:8.1f}ms p95={result['p95_ms']:8.1f}ms "
+                    f"p99={result['p99_ms']:8.1f}ms cpu={result['cpu_ms']:6.1f}ms bytes={result['bytes_per_request']:7.0f} "
+                    f"queries={result['queries_per_request']:5.1f} "
+                    f"rss={result['rss_mb']:.0f}MB errors={result['errors']}"
+                )
+        finally:
+            User.objects.filter(username__startswith=f"{REGISTER_PREFIX}{self.run_id}_").delete()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+        if options["baseline"]:
+            self.compare(report, options["baseline"], options["tolerance"])
+
+    def run(self, scenario, warmup, requests):
+        for i in range(warmup):
+            scenario(-1 - i)
+        latencies, cpu, sizes, queries, errors = [], [], [], [], 0
+        rss_before = _rss_mb()
+        for i in range(requests):
+            with CaptureQueriesContext(connection) as ctx:
+                t0, c0 = time.perf_counter(), time.process_time()
+                response, expected = scenario(i)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                cpu.append((time.process_time() - c0) * 1000)
+            sizes.append(len(response.content))
+            queries.append(len(ctx))
+            errors += response.status_code != expected
+        q = statistics.quantiles(latencies, n=100, method="inclusive")
+        rss_after = _rss_mb()
+        return {
+            "requests": requests,
+            "errors": errors,
+            "mean_ms": round(statistics.fmean(latencies), 2),
+            "p50_ms": round(q[49], 2),
+            "p95_ms": round(q[94], 2),
+            "p99_ms": round(q[98], 2),
+            "max_ms": round(max(latencies), 2),
+            # This process only: serialization and rendering, not Postgres.
+            "cpu_ms": round(statistics.fmean(cpu), 2),
+            "bytes_per_request": round(statistics.fmean(sizes)),
+            "queries_per_request": round(statistics.fmean(queries), 2),
+            "max_queries": max(queries),
+            "rss_mb": round(rss_after or _peak_rss_mb(), 1),
+            "rss_growth_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+        }
+
+    def compare(self, report, baseline_path, tolerance):
+        with open(baseline_path) as f:
+            baseline = json.load(f)["scenarios"]
+        regressions = []
+        for name, result in report["scenarios"].items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+            if result["queries_per_request"] > before["queries_per_request"]:
+                regressions.append(
+                    f"{name}: queries/request {before['queries_per_request']} -> {result['queries_per_request']}"
+                )
+            if result["errors"] > before["errors"]:
+                regressions.append(f"{name}: errors {before['errors']} -> {result['errors']}")
+        if regressions:
+            raise CommandError("Regressions against baseline:\n  " + "\n  ".join(regressions))
+        self.stderr.write(self.style.SUCCESS(f"No regressions against {baseline_path}."))
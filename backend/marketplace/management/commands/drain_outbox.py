@@ -0,0 +1,33 @@
+"""Deliver outbox events as per-user notifications (see marketplace.events)."""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from marketplace import events
+
+PRUNE_SECONDS = 60 * 60
+
+class Command(BaseCommand):
+    help = "Turn outbox events into notifications for GET /api/events/."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Events per transaction (default 500).")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when the outbox is empty (default 1).")
+        parser.add_argument("--once", action="store_true", help="Exit once the outbox is empty.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        pruned_at = None
+        while True:
+            if pruned_at is None or time.monotonic() - pruned_at >= PRUNE_SECONDS:
+                pruned = events.prune()
+                pruned_at = time.monotonic()
+                if pruned:
+                    self.stdout.write(f"Pruned {pruned} notifications")
+            total = 0
+            while drained := events.drain(options["batch_size"]):
+                total += drained
+            if total:
+                self.stdout.write(f"Drained {total} events")
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
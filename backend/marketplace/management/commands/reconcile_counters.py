@@ -0,0 +1,37 @@
+"""Recompute the denormalized popularity counters and fix any that drifted."""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from marketplace.caching import invalidate_tags
+from marketplace.models import SkillTag, Project
+
+class Command(BaseCommand):
+    help = "Reconcile SkillTag.project_count and Project.proposal_count/accepted_count with the real counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000, help="Primary keys per UPDATE (default 10000).")
+        parser.add_argument("--dry-run", action="store_true", help="Report drifted rows without writing them.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        fixed = {
+            "projects": self.reconcile(Project.objects.all(), "refresh_counters", options),
+            "skills": self.reconcile(SkillTag.objects.all(), "refresh_project_count", options),
+        }
+        if any(fixed.values()) and not options["dry_run"]:
+            invalidate_tags(*(name for name, count in fixed.items() if count))
+        verb = "would fix" if options["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(
+            "Counters: " + ", ".join(f"{verb} {count} {name}" for name, count in fixed.items())
+        ))
+
+    def reconcile(self, queryset, method, options):
+        size, total = options["batch_size"], 0
+        last = queryset.aggregate(last=Max("pk"))["last"] or 0
+        for start in range(0, last + 1, size):
+            batch = queryset.filter(pk__gte=start, pk__lt=start + size)
+            with transaction.atomic():
+                total += getattr(batch, method)()
+                transaction.set_rollback(options["dry_run"])
+        return total
@@ -0,0 +1,170 @@
+"""Synthetic data for the benchmark suite (see bench_api)."""
+import random
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from accounts.models import User, Profile, Work
+from marketplace import autocomplete, recommendations
+from marketplace.caching import invalidate_tags
+from marketplace.models import SkillTag, Project, Proposal
+from marketplace.seed import seed_skills
+
+BATCH = 5000
+PASSWORD = "bench-pass"
+USER_PREFIX = "bench_user_"
+TAG_PREFIX = "bench-tag-"
+WORDS = ("game mobile app web dashboard landing brand logo react vue django api figma "
+         "minimalist playful illustration shop portfolio data chart chat social music "
+         "fitness travel finance editor booking map video stream wallet").split()
+ROLES = ["DEV", "DES", "BOTH"]
+
+def _text(rnd, n):
+    return " ".join(rnd.choices(WORDS, k=n))
+
+def _project(rnd, owner_id):
+    budget = rnd.randrange(100, 5000, 50)
+    return Project(owner_id=owner_id, title=_text(rnd, 3), description=_text(rnd, 40),
+                   looking_for_role=rnd.choice(ROLES), status="OPEN" if rnd.random() < 0.85 else "CLOSED",
+                   budget_min=budget, budget_max=budget * 2)
+
+def _next_id(model):
+    return (model.objects.order_by("-id").values_list("id", flat=True).first() or 0) + 1
+
+class Command(BaseCommand):
+    help = "Seed users, profiles, works, projects with tags and proposals for benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=int, default=10000, help="Number of projects (default 10000).")
+        parser.add_argument("--users", type=int, help="Default: scale / 10, at least 20.")
+        parser.add_argument("--works", type=int, help="Default: scale / 2.")
+        parser.add_argument("--proposals", type=int, help="Default: scale.")
+        parser.add_argument("--tags", type=int, default=200, help="Generated tags on top of the base skills.")
+
+    def handle(self, *args, **options):
+        scale = options["scale"]
+        targets = {
+            "users": options["users"] or max(scale // 10, 20),
+            "works": options["works"] if options["works"] is not None else scale // 2,
+            "projects": scale,
+            "proposals": options["proposals"] if options["proposals"] is not None else scale,
+        }
+        tag_ids = self.seed_tags(options["tags"])
+        self.seed_users(targets["users"], tag_ids)
+        user_ids = list(User.objects.filter(username__startswith=USER_PREFIX).order_by("id").values_list("id", flat=True))
+        self.seed_works(targets["works"], user_ids)
+        self.seed_projects(targets["projects"], user_ids, tag_ids)
+        self.seed_proposals(targets["proposals"], user_ids)
+        # bulk_create skips the signals that keep these caches and counters honest.
+        call_command("reconcile_counters", stdout=self.stdout)
+        invalidate_tags("projects", "skills")
+        recommendations.bump_version()
+        autocomplete.bump_version()
+        self.stdout.write(self.style.SUCCESS(
+            "Bench data: " + ", ".join(f"{count} {name}" for name, count in self.counts().items())
+        ))
+
+    def counts(self):
+        return {
+            "skills": SkillTag.objects.count(),
+            "users": User.objects.filter(username__startswith=USER_PREFIX).count(),
+            "works": Work.objects.filter(user__username__startswith=USER_PREFIX).count(),
+            "projects": Project.objects.filter(owner__username__startswith=USER_PREFIX).count(),
+            "proposals": Proposal.objects.filter(submitter__username__startswith=USER_PREFIX).count(),
+        }
+
+    def progress(self, name, done, target):
+        self.stdout.write(f"  {name}: {done}/{target}")
+
+    def seed_tags(self, extra):
+        seed_skills()
+        kinds = [k for k, _ in SkillTag.KIND_CHOICES]
+        SkillTag.objects.bulk_create(
+            [SkillTag(name=f"{TAG_PREFIX}{i}", kind=kinds[i % len(kinds)]) for i in range(extra)],
+            ignore_conflicts=True,
+        )
+        return list(SkillTag.objects.order_by("id").values_list("id", flat=True))
+
+    def seed_users(self, target, tag_ids):
+        existing = User.objects.filter(username__startswith=USER_PREFIX).count()
+        password = make_password(PASSWORD)
+        Through = Profile.skills.through
+        for start in range(existing, target, BATCH):
+            rnd = random.Random(f"users:{start}")
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f"{USER_PREFIX}{i}", email=f"{USER_PREFIX}{i}@example.com",
+                         password=password, role=rnd.choice(ROLES))
+                    for i in range(start, min(start + BATCH, target))
+                ])
+                profiles = Profile.objects.bulk_create([
+                    Profile(user=u, display_name=u.username.replace("_", " ").title(), bio=_text(rnd, 20),
+                            hourly_rate=rnd.randint(20, 150), availability="Part-time")
+                    for u in users
+                ])
+                Through.objects.bulk_create([
+                    Through(profile_id=p.id, skilltag_id=t) for p in profiles for t in rnd.sample(tag_ids, 3)
+                ])
+            self.progress("users", start + len(users), target)
+
+    def seed_works(self, target, user_ids):
+        existing = Work.objects.filter(user__username__startswith=USER_PREFIX).count()
+        first_id = _next_id(Work)
+        for start in range(existing, target, BATCH):
+            rnd = random.Random(f"works:{start}")
+            works = Work.objects.bulk_create([
+                Work(user_id=user_ids[i % len(user_ids)], title=_text(rnd, 3), image=f"works/bench/{i}.jpg")
+                for i in range(start, min(start + BATCH, target))
+            ])
+            self.progress("works", start + len(works), target)
+        self.spread_created_at(Work, first_id)
+
+    def seed_projects(self, target, user_ids, tag_ids):
+        existing = Project.objects.filter(owner__username__startswith=USER_PREFIX).count()
+        Through = Project.tags.through
+        first_id = _next_id(Project)
+        for start in range(existing, target, BATCH):
+            rnd = random.Random(f"projects:{start}")
+            with transaction.atomic():
+                projects = Project.objects.bulk_create([
+                    _project(rnd, user_ids[(i * 7) % len(user_ids)]) for i in range(start, min(start + BATCH, target))
+                ])
+                Through.objects.bulk_create([
+                    Through(project_id=p.id, skilltag_id=t) for p in projects for t in rnd.sample(tag_ids, rnd.randint(1, 5))
+                ])
+                batch = Project.objects.filter(pk__in=[p.id for p in projects])
+                batch.refresh_search_vector()
+                batch.refresh_tag_array()
+            self.progress("projects", start + len(projects), target)
+        self.spread_created_at(Project, first_id)
+
+    def seed_proposals(self, target, user_ids):
+        existing = Proposal.objects.filter(submitter__username__startswith=USER_PREFIX).count()
+        if existing >= target:
+            return
+        projects = list(
+            Project.objects.filter(owner__username__startswith=USER_PREFIX).order_by("id").values_list("id", "owner_id")
+        )
+        first_id = _next_id(Proposal)
+        for start in range(existing, target, BATCH):
+            rnd = random.Random(f"proposals:{start}")
+            # Proposal i goes to project i % P from a submitter that differs for every lap over the projects.
+            proposals = Proposal.objects.bulk_create([
+                Proposal(project_id=projects[i % len(projects)][0], project_owner_id=projects[i % len(projects)][1],
+                         submitter_id=user_ids[(i % len(projects) + i // len(projects) + 1) % len(user_ids)],
+                         cover_letter=_text(rnd, 30),
+                         status=rnd.choices(["PENDING", "ACCEPTED", "REJECTED"], weights=[8, 1, 1])[0])
+                for i in range(start, min(start + BATCH, target))
+            ], ignore_conflicts=True)
+            self.progress("proposals", start + len(proposals), target)
+        self.spread_created_at(Proposal, first_id)
+
+    def spread_created_at(self, model, first_id):
+        """Spread created_at over the past year, which auto_now_add would otherwise pin to now."""
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET created_at = now() - "
+                f"((id * 7919) %% 31536000) * interval '1 second' WHERE id >= %s",
+                [first_id],
+            )
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:26
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Mirrors ProjectQuerySet.refresh_search_vector for rows that existed before the column.
+BACKFILL_SEARCH_VECTOR = """
+UPDATE marketplace_project AS p SET search_vector =
+    setweight(to_tsvector('english', coalesce(p.title, '')), 'A')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM marketplace_skilltag t
+        JOIN marketplace_project_tags pt ON pt.skilltag_id = t.id
+        WHERE pt.project_id = p.id
+    ), '')), 'A')
+    || setweight(to_tsvector('english', coalesce(p.looking_for_role, '')), 'B')
+    || setweight(to_tsvector('english', coalesce(p.description, '')), 'C');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0002_project_project_created_id_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='project_search_vector_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_VECTOR, reverse_sql=migrations.RunSQL.noop),
+    ]
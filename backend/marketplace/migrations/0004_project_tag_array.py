@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:29
+
+import django.contrib.postgres.fields
+from django.conf import settings
+from django.db import migrations, models
+
+# Mirrors ProjectQuerySet.refresh_tag_array for rows that existed before the column.
+BACKFILL_TAG_ARRAY = """
+UPDATE marketplace_project AS p SET tag_array = coalesce((
+    SELECT array_agg(pt.skilltag_id ORDER BY pt.skilltag_id)
+    FROM marketplace_project_tags pt
+    WHERE pt.project_id = p.id
+), '{}');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0003_project_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='tag_array',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.RunSQL(BACKFILL_TAG_ARRAY, reverse_sql=migrations.RunSQL.noop),
+    ]
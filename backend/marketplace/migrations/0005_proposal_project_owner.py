@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Mirrors Proposal.save for rows that existed before the column.
+BACKFILL_PROJECT_OWNER = """
+UPDATE marketplace_proposal AS pr SET project_owner_id = p.owner_id
+FROM marketplace_project p
+WHERE p.id = pr.project_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0004_project_tag_array'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposal',
+            name='project_owner',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='received_proposals', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunSQL(BACKFILL_PROJECT_OWNER, reverse_sql=migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='proposal',
+            name='project_owner',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='received_proposals', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='proposal',
+            name='submitter',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='proposals', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='proposal',
+            index=models.Index(fields=['project_owner', '-created_at', '-id'], name='proposal_owner_created_idx'),
+        ),
+    ]
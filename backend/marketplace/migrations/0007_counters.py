@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:23
+
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+# Same numbers reconcile_counters converges to, in one aggregate pass per table.
+BACKFILL_PROJECT_COUNTERS = """
+UPDATE marketplace_project AS p SET proposal_count = c.total, accepted_count = c.accepted
+FROM (
+    SELECT project_id, count(*) AS total, count(*) FILTER (WHERE status = 'ACCEPTED') AS accepted
+    FROM marketplace_proposal GROUP BY project_id
+) c
+WHERE c.project_id = p.id;
+"""
+BACKFILL_SKILLTAG_COUNTERS = """
+UPDATE marketplace_skilltag AS t SET project_count = c.total
+FROM (SELECT skilltag_id, count(*) AS total FROM marketplace_project_tags GROUP BY skilltag_id) c
+WHERE c.skilltag_id = t.id;
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0006_project_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='accepted_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='proposal_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='skilltag',
+            name='project_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_PROJECT_COUNTERS, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(BACKFILL_SKILLTAG_COUNTERS, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('proposal_count'), '*', models.Value(1099511627776)), '+', models.F('id')), output_field=models.BigIntegerField()), name='project_proposal_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('accepted_count'), '*', models.Value(1099511627776)), '+', models.F('id')), output_field=models.BigIntegerField()), name='project_accepted_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skilltag',
+            index=models.Index(models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('project_count'), '*', models.Value(1099511627776)), '+', models.F('id')), output_field=models.BigIntegerField()), name='skilltag_project_count_idx'),
+        ),
+    ]
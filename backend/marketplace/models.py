@@ -1,12 +1,101 @@
-from django.db import models
+from django.db import connections, models
 from django.conf import settings
+from django.utils import timezone
+from django.contrib.postgres.aggregates import ArrayAgg, StringAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = "english"
+SORT_KEY_SHIFT = 2 ** 40
+
+def counter_sort_key(field):
+    """
+    field * 2**40 + id: orders by a counter with id breaking ties, as one
+    unique bigint, so cursor pagination can seek on it and an expression index
+    on it serves both directions.
+    """
+    return models.ExpressionWrapper(
+        models.F(field) * SORT_KEY_SHIFT + models.F("id"), output_field=models.BigIntegerField()
+    )
+
+class SkillTagQuerySet(models.QuerySet):
+    def refresh_project_count(self):
+        """Recompute project_count in one UPDATE, writing only the rows that drifted."""
+        Through = Project.tags.through
+        count = Coalesce(models.Subquery(
+            Through.objects.filter(skilltag_id=models.OuterRef("pk")).order_by()
+            .values("skilltag_id").annotate(n=models.Count("id")).values("n")
+        ), 0)
+        return self.annotate(actual=count).exclude(project_count=models.F("actual")).update(project_count=count)
 
 class SkillTag(models.Model):
     KIND_CHOICES = [("ROLE","Role"),("TOOL","Tool"),("STYLE","Style"),("GENRE","Genre")]
     name = models.CharField(max_length=64, unique=True)
     kind = models.CharField(max_length=8, choices=KIND_CHOICES, default="TOOL")
+    # Projects carrying the tag; kept by marketplace.signals, reconciled by reconcile_counters.
+    project_count = models.IntegerField(default=0, editable=False)
+    objects = SkillTagQuerySet.as_manager()
+    class Meta:
+        indexes = [models.Index(counter_sort_key("project_count"), name="skilltag_project_count_idx")]
     def __str__(self): return self.name
 
+class ProjectQuerySet(models.QuerySet):
+    def refresh_search_vector(self):
+        """Recompute search_vector in one UPDATE from title, tag names, role and description."""
+        tag_names = (
+            SkillTag.objects.filter(projects=models.OuterRef("pk"))
+            .values("projects")
+            .annotate(names=StringAgg("name", delimiter=" "))
+            .values("names")
+        )
+        return self.update(search_vector=(
+            SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector(models.Subquery(tag_names), weight="A", config=SEARCH_CONFIG)
+            + SearchVector("looking_for_role", weight="B", config=SEARCH_CONFIG)
+            + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+        ))
+
+    def refresh_tag_array(self):
+        """Recompute tag_array in one UPDATE from the Project.tags through table."""
+        Through = Project.tags.through
+        tag_ids = (
+            Through.objects.filter(project_id=models.OuterRef("pk"))
+            .values("project_id")
+            .annotate(ids=ArrayAgg("skilltag_id", ordering="skilltag_id"))
+            .values("ids")
+        )
+        return self.update(tag_array=Coalesce(models.Subquery(tag_ids), models.Value([])))
+
+    def refresh_counters(self):
+        """Recompute proposal_count and accepted_count in one UPDATE, writing only the rows that drifted."""
+        proposals = Proposal.objects.filter(project_id=models.OuterRef("pk")).order_by().values("project_id")
+        total = Coalesce(models.Subquery(proposals.annotate(n=models.Count("id")).values("n")), 0)
+        accepted = Coalesce(models.Subquery(
+            proposals.filter(status="ACCEPTED").annotate(n=models.Count("id")).values("n")
+        ), 0)
+        return (
+            self.annotate(actual=total, actual_accepted=accepted)
+            .exclude(proposal_count=models.F("actual"), accepted_count=models.F("actual_accepted"))
+            .update(proposal_count=total, accepted_count=accepted)
+        )
+
+    def facet_counts(self):
+        """Project counts over this queryset: in total, per tag, per looking_for_role and per status."""
+        projects = self.order_by()
+        tags = (
+            SkillTag.objects.using(self.db).filter(projects__in=projects.values("pk"))
+            .values("id", "name", "kind").annotate(count=models.Count("projects"))
+            .order_by("-count", "name")
+        )
+        facets = {"count": 0, "tags": list(tags), "roles": {}, "status": {}}
+        for row in projects.values("looking_for_role", "status").annotate(n=models.Count("id")):
+            facets["count"] += row["n"]
+            facets["roles"][row["looking_for_role"]] = facets["roles"].get(row["looking_for_role"], 0) + row["n"]
+            facets["status"][row["status"]] = facets["status"].get(row["status"], 0) + row["n"]
+        return facets
+
 class Project(models.Model):
     STATUS = [("OPEN","Open"),("CLOSED","Closed")]
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="projects")
@@ -18,14 +107,188 @@ class Project(models.Model):
     tags = models.ManyToManyField(SkillTag, blank=True, related_name="projects")
     looking_for_role = models.CharField(max_length=8, choices=[("DEV","Developer"),("DES","Designer"),("BOTH","Both")], default="BOTH")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized by marketplace.signals whenever the title, description or tags change.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Sparse tag vector (sorted SkillTag ids) used by marketplace.recommendations.
+    tag_array = ArrayField(models.BigIntegerField(), default=list, blank=True, editable=False)
+    # Kept by marketplace.signals (and the bulk paths that skip them), reconciled by reconcile_counters.
+    proposal_count = models.IntegerField(default=0, editable=False)
+    accepted_count = models.IntegerField(default=0, editable=False)
+    objects = ProjectQuerySet.as_manager()
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at","-id"], name="project_created_id_idx"),
+            GinIndex(fields=["search_vector"], name="project_search_vector_idx"),
+            # ProjectFilter: the default ?status=OPEN browse, budget ranges and tag/kind overlaps.
+            models.Index(fields=["-created_at","-id"], condition=models.Q(status="OPEN"), name="project_open_created_idx"),
+            models.Index(fields=["budget_min"], name="project_budget_min_idx"),
+            models.Index(fields=["budget_max"], name="project_budget_max_idx"),
+            GinIndex(fields=["tag_array"], name="project_tag_array_idx"),
+            # ?ordering=[-]proposal_count / [-]accepted_count (see CounterOrderingFilter).
+            models.Index(counter_sort_key("proposal_count"), name="project_proposal_count_idx"),
+            models.Index(counter_sort_key("accepted_count"), name="project_accepted_count_idx"),
+        ]
     def __str__(self): return self.title
 
+class ProposalQuerySet(models.QuerySet):
+    def moderate(self, ids, status, reject_pending=False):
+        """
+        In one UPDATE, set status on the proposals in this queryset whose id is
+        in ids and, with reject_pending, reject its other PENDING proposals.
+        Returns {id: (previous status, status)} for every row written. Each
+        status that actually changed gets a proposal.status OutboxEvent in the
+        same statement.
+        """
+        if not ids and not reject_pending:
+            # Nothing to write, and an empty id__in can't even be compiled to SQL.
+            return {}
+        targets = self.filter(models.Q(id__in=ids) | models.Q(status="PENDING")) if reject_pending else self.filter(id__in=ids)
+        # Django's update() can't say which rows it touched or what they held; RETURNING can.
+        subquery, params = targets.values("id").query.sql_with_params()
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"WITH previous AS (SELECT id, status FROM {table} WHERE id IN ({subquery}) FOR UPDATE), "
+                f"updated AS (UPDATE {table} p SET status = CASE WHEN p.id = ANY(%s) THEN %s ELSE 'REJECTED' END "
+                f"FROM previous WHERE p.id = previous.id "
+                f"RETURNING p.id, p.project_id, p.submitter_id, previous.status AS previous, p.status), "
+                f"outboxed AS (INSERT INTO {OutboxEvent._meta.db_table} (kind, payload, created_at) "
+                f"SELECT 'proposal.status', jsonb_build_object('proposal', id, 'project', project_id, "
+                f"'submitter', submitter_id, 'previous', previous, 'status', status), %s "
+                f"FROM updated WHERE previous <> status) "
+                f"SELECT id, previous, status FROM updated",
+                [*params, list(ids), status, timezone.now()],
+            )
+            return {pk: (previous, current) for pk, previous, current in cursor.fetchall()}
+
+    def submit(self, project_id, submitter_id, cover_letter, idempotency_key=None):
+        """
+        Submit a proposal in one statement. The project row is locked, and the
+        INSERT only happens while it is OPEN; a proposal the submitter already
+        has on the project is returned instead of violating unique_together
+        (ON CONFLICT ... DO UPDATE locks and returns it even when a concurrent
+        submission just committed it). A new proposal bumps proposal_count in
+        the same statement, which the signals would otherwise do.
+
+        Returns (project status, proposal, created): status is None when the
+        project doesn't exist, and proposal None when it isn't OPEN and the
+        submitter has no proposal on it. Reusing an idempotency_key for another
+        project raises IntegrityError. A new proposal also gets its
+        proposal.created OutboxEvent in the statement.
+        """
+        self._for_write = True
+        meta, project_table, outbox_table = self.model._meta, Project._meta.db_table, OutboxEvent._meta.db_table
+        table = meta.db_table
+        # In concrete field order, so the rows can go straight to from_db().
+        columns = ", ".join(f.column for f in meta.concrete_fields)
+        sql = f"""
+            WITH locked AS (
+                SELECT id, owner_id, status FROM {project_table} WHERE id = %s FOR NO KEY UPDATE
+            ), inserted AS (
+                INSERT INTO {table} (project_id, submitter_id, project_owner_id, cover_letter, status, created_at, idempotency_key)
+                SELECT id, %s, owner_id, %s, 'PENDING', %s, %s FROM locked WHERE status = 'OPEN'
+                ON CONFLICT (project_id, submitter_id) DO UPDATE SET status = {table}.status
+                RETURNING {columns}, xmax = 0 AS created
+            ), counted AS (
+                UPDATE {project_table} SET proposal_count = proposal_count + 1
+                WHERE id = %s AND EXISTS (SELECT FROM inserted WHERE created)
+            ), outboxed AS (
+                INSERT INTO {outbox_table} (kind, payload, created_at)
+                SELECT 'proposal.created', jsonb_build_object('proposal', id, 'project', project_id,
+                       'submitter', submitter_id, 'project_owner', project_owner_id), created_at
+                FROM inserted WHERE created
+            )
+            SELECT locked.status, proposal.* FROM locked LEFT JOIN (
+                SELECT * FROM inserted
+                UNION ALL
+                SELECT {columns}, false FROM {table}
+                WHERE project_id = %s AND submitter_id = %s AND NOT EXISTS (SELECT FROM inserted)
+            ) proposal ON true
+        """
+        params = [project_id, submitter_id, cover_letter, timezone.now(), idempotency_key,
+                  project_id, project_id, submitter_id]
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            return None, None, False
+        status, *values, created = row
+        if values[0] is None:
+            return status, None, False
+        return status, self.model.from_db(self.db, [f.attname for f in meta.concrete_fields], values), created
+
 class Proposal(models.Model):
     STATUS = [("PENDING","Pending"),("ACCEPTED","Accepted"),("REJECTED","Rejected")]
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="proposals")
-    submitter = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="proposals")
+    # Indexed by proposal_submitter_created_idx.
+    submitter = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="proposals", db_index=False)
+    # Copy of project.owner, so "proposals to my projects" is an index scan on this table instead of a join.
+    # Set by save(); marketplace.signals follows owner changes on the project.
+    project_owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                      related_name="received_proposals", editable=False, db_index=False)
     cover_letter = models.TextField()
     status = models.CharField(max_length=10, choices=STATUS, default="PENDING")
     created_at = models.DateTimeField(auto_now_add=True)
-    class Meta: unique_together = ("project","submitter")
+    # Idempotency-Key of the request that created it, so a retry can be told apart from a second submission.
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True, editable=False)
+    objects = ProposalQuerySet.as_manager()
+    class Meta:
+        unique_together = ("project","submitter")
+        constraints = [
+            models.UniqueConstraint(fields=["submitter","idempotency_key"], condition=models.Q(idempotency_key__isnull=False),
+                                    name="proposal_submitter_idempotency_key"),
+        ]
+        indexes = [
+            # Outbox and inbox pages in cursor order (see ProposalViewSet). There is deliberately no
+            # global (-created_at, -id) index: the planner would walk it and filter for the user.
+            models.Index(fields=["submitter","-created_at","-id"], name="proposal_submitter_created_idx"),
+            models.Index(fields=["project_owner","-created_at","-id"], name="proposal_owner_created_idx"),
+        ]
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_project_id = instance.__dict__.get("project_id")
+        return instance
+    def save(self, *args, update_fields=None, **kwargs):
+        # project_owner only needs setting when the project changes; the signal keeps it in step with the owner.
+        if (update_fields is None or "project" in update_fields) and self.project_id != getattr(self, "_saved_project_id", None):
+            if Proposal.project.is_cached(self):
+                self.project_owner_id = self.project.owner_id
+            else:
+                self.project_owner_id = Project.objects.values_list("owner_id", flat=True).get(pk=self.project_id)
+            if update_fields is not None:
+                update_fields = {*update_fields, "project_owner"}
+        super().save(*args, update_fields=update_fields, **kwargs)
+        self._saved_project_id = self.project_id
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        if fields is None:
+            # Like a fresh load: the counters (see marketplace.signals) and project_owner now match these values.
+            self._counted = (self.project_id, self.status)
+            self._saved_project_id = self.project_id
     def __str__(self): return f"{self.submitter} -> {self.project}"
+
+class OutboxEvent(models.Model):
+    """
+    A change to notify users about, written in the same transaction as the
+    change itself; marketplace.events drains these into Notifications.
+    payload holds ids only (see marketplace.events for each kind's fields).
+    """
+    KINDS = [("proposal.created","Proposal created"),("proposal.status","Proposal status changed"),
+             ("project.closed","Project closed")]
+    kind = models.CharField(max_length=32, choices=KINDS)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class Notification(models.Model):
+    """An OutboxEvent delivered to one user; the id is the cursor of GET /api/events/."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="notifications", db_index=False)
+    kind = models.CharField(max_length=32, choices=OutboxEvent.KINDS)
+    payload = models.JSONField()
+    created_at = models.DateTimeField()
+    class Meta:
+        indexes = [
+            # "Events for this user after the cursor" is a range scan.
+            models.Index(fields=["user","id"], name="notification_user_id_idx"),
+            models.Index(fields=["created_at"], name="notification_created_idx"),
+        ]
@@ -0,0 +1,224 @@
+"""Skill-match ranking of OPEN projects for a user from a per-process bitset index."""
+import copy
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.core.cache import cache
+from django.db import transaction
+from .models import SkillTag, Project
+
+TAG_WEIGHT = 10
+ROLE_WEIGHT = 5
+MAX_RESULTS = 50
+CACHE_TTL = 60 * 15
+VERSION_KEY = "recommended:version"
+# How far behind an index may be and still catch up from the change log.
+CHANGE_LOG_VERSIONS = 1000
+CHANGE_LOG_TTL = 60 * 60
+INDEX_FIELDS = ("pk", "owner_id", "looking_for_role", "tag_array", "status", "created_at")
+
+# Which looking_for_role values a user of a given role can fill.
+ROLE_MATCHES = {
+    "DEV": ["DEV", "BOTH"],
+    "DES": ["DES", "BOTH"],
+    "BOTH": ["DEV", "DES", "BOTH"],
+}
+
+_batch = ContextVar("recommendations_batch", default=None)
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+def _changes_key(version):
+    return f"recommended:changes:{version}"
+
+def bump_version(project_ids=None):
+    """
+    Invalidate every user's cached ranking. Indexes apply ``project_ids`` as
+    row deltas; None (e.g. after bulk writes) makes them rebuild.
+    """
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+        return
+    if project_ids is not None:
+        cache.set(_changes_key(version), sorted(project_ids), CHANGE_LOG_TTL)
+
+def projects_changed(project_ids):
+    """Bump the version for these projects once the current transaction commits, or at the end of a batched() block."""
+    batch = _batch.get()
+    if batch is not None:
+        batch.append(set(project_ids))
+    else:
+        ids = set(project_ids)
+        transaction.on_commit(lambda: bump_version(ids))
+
+@contextmanager
+def batched():
+    """Collect the projects changed in the block into a single version bump, e.g. a save followed by tags.set()."""
+    if _batch.get() is not None:
+        yield
+        return
+    batch = []
+    token = _batch.set(batch)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+        if batch:
+            changed = set().union(*batch)
+            transaction.on_commit(lambda: bump_version(changed))
+
+def _cache_key(user_id):
+    return f"recommended:{_version()}:{user_id}"
+
+def invalidate_user(user_id):
+    cache.delete(_cache_key(user_id))
+
+def _to_bitset(positions, size):
+    buf = bytearray((size + 7) // 8)
+    for pos in positions:
+        buf[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buf, "little")
+
+class ProjectTagIndex:
+    """Bitsets over OPEN projects (position 0 = oldest) per tag id and per looking_for_role."""
+
+    def __init__(self, version):
+        self.version = version
+        rows = list(
+            Project.objects.filter(status="OPEN")
+            .order_by("created_at", "id")
+            .values_list(*INDEX_FIELDS)
+        )
+        self.ids = [r[0] for r in rows]
+        self.owners = [r[1] for r in rows]
+        # (looking_for_role, tag ids) behind each position's bits; None once it closed.
+        self.inputs = [(r[2], r[3]) for r in rows]
+        self.positions = {pk: pos for pos, pk in enumerate(self.ids)}
+        self.newest = (rows[-1][5], rows[-1][0]) if rows else None
+        self.closed = 0
+        tag_positions, role_positions = {}, {}
+        for pos, (_, _, role, tags, _, _) in enumerate(rows):
+            role_positions.setdefault(role, []).append(pos)
+            for tag_id in tags:
+                tag_positions.setdefault(tag_id, []).append(pos)
+        size = len(rows)
+        self.tag_bits = {t: _to_bitset(p, size) for t, p in tag_positions.items()}
+        self.role_bits = {r: _to_bitset(p, size) for r, p in role_positions.items()}
+
+    def updated(self, version):
+        """A copy caught up to ``version`` from the change log, or None when it has to be rebuilt."""
+        if not self.version < version <= self.version + CHANGE_LOG_VERSIONS:
+            return None
+        keys = [_changes_key(v) for v in range(self.version + 1, version + 1)]
+        logged = cache.get_many(keys)
+        if len(logged) != len(keys):
+            return None
+        index = copy.copy(self)
+        index.version = version
+        index.ids, index.owners, index.inputs = list(self.ids), list(self.owners), list(self.inputs)
+        index.positions, index.tag_bits, index.role_bits = dict(self.positions), dict(self.tag_bits), dict(self.role_bits)
+        changed = set().union(*logged.values())
+        rows = Project.objects.filter(pk__in=changed).values_list(*INDEX_FIELDS) if changed else ()
+        return index if index._apply(changed, rows) else None
+
+    def _flip(self, pos, inputs, on):
+        role, tags = inputs
+        for bitsets, key in [(self.role_bits, role), *((self.tag_bits, t) for t in tags)]:
+            bits = bitsets.get(key, 0)
+            bitsets[key] = bits | (1 << pos) if on else bits & ~(1 << pos)
+
+    def _apply(self, changed, rows):
+        rows = {row[0]: row for row in rows if row[4] == "OPEN"}
+        for pk in changed.intersection(self.positions):
+            pos = self.positions[pk]
+            if self.inputs[pos] is not None:
+                self._flip(pos, self.inputs[pos], False)
+                self.closed += 1
+            self.inputs[pos] = None
+            row = rows.pop(pk, None)
+            if row is not None:
+                self.owners[pos], self.inputs[pos] = row[1], (row[2], row[3])
+                self._flip(pos, self.inputs[pos], True)
+                self.closed -= 1
+        # What's left is newly OPEN; it can only go on top if it's newer than everything indexed.
+        for pk, owner_id, role, tags, _, created_at in sorted(rows.values(), key=lambda r: (r[5], r[0])):
+            if self.newest is not None and (created_at, pk) <= self.newest:
+                return False
+            pos = len(self.ids)
+            self.ids.append(pk)
+            self.owners.append(owner_id)
+            self.inputs.append((role, tags))
+            self.positions[pk] = pos
+            self.newest = (created_at, pk)
+            self._flip(pos, (role, tags), True)
+        # Closed positions keep their slot; rebuild once they outnumber the open ones.
+        return self.closed * 2 <= len(self.ids)
+
+    def rank(self, skill_ids, roles, user_id, limit):
+        # Bit-sliced counter: counters[i] holds bit i of each project's overlap count.
+        counters = []
+        for tag_id in set(skill_ids):
+            carry = self.tag_bits.get(tag_id, 0)
+            i = 0
+            while carry:
+                if i == len(counters):
+                    counters.append(0)
+                counters[i], carry = counters[i] ^ carry, counters[i] & carry
+                i += 1
+        role_mask = 0
+        for role in roles:
+            role_mask |= self.role_bits.get(role, 0)
+        any_overlap = 0
+        for c in counters:
+            any_overlap |= c
+
+        # Score bands from best to worst: each overlap count with then without a role match.
+        bands = []
+        for overlap in range(len(set(skill_ids)), 0, -1):
+            exact = any_overlap
+            for i, c in enumerate(counters):
+                exact &= c if (overlap >> i) & 1 else ~c
+            bands += [exact & role_mask, exact & ~role_mask]
+        bands.append(role_mask & ~any_overlap)
+
+        ranked = []
+        for bits in bands:
+            while bits and len(ranked) < limit:
+                pos = bits.bit_length() - 1
+                bits ^= 1 << pos
+                if self.owners[pos] != user_id:
+                    ranked.append(self.ids[pos])
+            if len(ranked) >= limit:
+                break
+        return ranked
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Return this process's ProjectTagIndex, catching it up (or rebuilding it) if the version moved."""
+    global _index
+    version = _version()
+    if _index is None or _index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = (_index and _index.updated(version)) or ProjectTagIndex(version)
+    return _index
+
+def rank_projects(user, limit=MAX_RESULTS):
+    """Return up to ``limit`` OPEN project ids ordered by match score (uncached)."""
+    skill_ids = list(SkillTag.objects.filter(profiles__user_id=user.pk).values_list("pk", flat=True))
+    roles = ROLE_MATCHES.get(user.role, ROLE_MATCHES["BOTH"])
+    return get_index().rank(skill_ids, roles, user.pk, limit)
+
+def recommended_project_ids(user, limit=MAX_RESULTS):
+    """Cached ``rank_projects``; the cache holds the full MAX_RESULTS list."""
+    key = _cache_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = rank_projects(user)
+        cache.set(key, ids, CACHE_TTL)
+    return ids[:limit]
@@ -0,0 +1,12 @@
+from .models import SkillTag
+
+SKILLS = [
+    ("UI/UX","ROLE"),("Front-end","ROLE"),("Back-end","ROLE"),
+    ("Figma","TOOL"),("Vue.js","TOOL"),("React","TOOL"),("Django","TOOL"),("PostgreSQL","TOOL"),
+    ("Minimalist","STYLE"),("Playful","STYLE"),
+    ("Game UI","GENRE"),("Web App","GENRE"),
+]
+
+def seed_skills():
+    for name, kind in SKILLS:
+        SkillTag.objects.get_or_create(name=name, kind=kind)
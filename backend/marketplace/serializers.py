@@ -1,27 +1,65 @@
 from rest_framework import serializers
-from .models import SkillTag, Project, Proposal
+from accounts.serializers import UserSummarySerializer
+from artfit.fieldsets import SparseFieldsetMixin
+from .models import SkillTag, Project, Proposal, Notification
 
 class SkillTagSerializer(serializers.ModelSerializer):
     class Meta:
         model = SkillTag
-        fields = ["id","name","kind"]
+        fields = ["id","name","kind","project_count"]
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSummarySerializer(serializers.ModelSerializer):
+    owner_username = serializers.CharField(source="owner.username", read_only=True)
+    class Meta:
+        model = Project
+        fields = ["id","title","status","owner","owner_username"]
+
+class ProjectSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     tags = SkillTagSerializer(many=True, read_only=True)
     tag_ids = serializers.PrimaryKeyRelatedField(many=True, write_only=True, queryset=SkillTag.objects.all(), source="tags")
+    owner_username = serializers.CharField(source="owner.username", read_only=True)
     class Meta:
         model = Project
-        fields = ["id","owner","title","description","status","budget_min","budget_max","looking_for_role","tags","tag_ids","created_at"]
+        fields = ["id","owner","owner_username","title","description","status","budget_min","budget_max","looking_for_role","tags","tag_ids","proposal_count","accepted_count","created_at"]
         read_only_fields = ["owner","created_at"]
+        expandable_fields = {"owner": (UserSummarySerializer, {})}
     def create(self, validated_data):
-        validated_data["owner"] = self.context["request"].user
+        validated_data["owner_id"] = self.context["request"].user.pk
         return super().create(validated_data)
 
-class ProposalSerializer(serializers.ModelSerializer):
+class ProjectImportSerializer(ProjectSerializer):
+    # Plain ids: ProjectViewSet.bulk_import resolves a whole batch of them with one in_bulk.
+    tag_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, write_only=True)
+
+class ProposalSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Proposal
         fields = ["id","project","submitter","cover_letter","status","created_at"]
         read_only_fields = ["submitter","status","created_at"]
+        expandable_fields = {"project": (ProjectSummarySerializer, {}), "submitter": (UserSummarySerializer, {})}
+    def get_extra_kwargs(self):
+        extra_kwargs = super().get_extra_kwargs()
+        if self.instance is not None:
+            # Only submit() checks the project is OPEN, so a proposal can't be moved to another one.
+            extra_kwargs.setdefault("project", {})["read_only"] = True
+        return extra_kwargs
     def create(self, validated_data):
-        validated_data["submitter"] = self.context["request"].user
+        validated_data["submitter_id"] = self.context["request"].user.pk
         return super().create(validated_data)
+
+class ProposalSubmissionSerializer(serializers.Serializer):
+    # A bare pk: ProposalQuerySet.submit finds (and locks) the project itself.
+    project = serializers.IntegerField(min_value=1)
+    cover_letter = serializers.CharField()
+
+class ProposalModerationSerializer(serializers.Serializer):
+    project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())
+    ids = serializers.ListField(child=serializers.IntegerField(), max_length=1000)
+    status = serializers.ChoiceField(choices=["ACCEPTED","REJECTED"])
+    reject_pending = serializers.BooleanField(default=False)
+    close_project = serializers.BooleanField(default=False)
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ["id","kind","payload","created_at"]
@@ -0,0 +1,221 @@
+from django.db.models import F
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from accounts.models import User, Profile
+from .caching import invalidate_tags
+from .models import SkillTag, Project, Proposal
+from . import autocomplete, events, recommendations
+
+SEARCH_SOURCE_FIELDS = {"title", "description", "looking_for_role"}
+
+@receiver(post_save, sender=Project)
+def refresh_project_search_vector(sender, instance: Project, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_SOURCE_FIELDS.intersection(update_fields):
+        return
+    Project.objects.filter(pk=instance.pk).refresh_search_vector()
+
+@receiver(post_save, sender=Project)
+def sync_proposal_project_owner(sender, instance: Project, created: bool, update_fields=None, **kwargs):
+    # Proposal.project_owner mirrors the owner; a no-op UPDATE unless it changed.
+    if created or (update_fields is not None and not {"owner", "owner_id"}.intersection(update_fields)):
+        return
+    instance.proposals.exclude(project_owner_id=instance.owner_id).update(project_owner_id=instance.owner_id)
+
+@receiver(m2m_changed, sender=Project.tags.through)
+def refresh_tag_fields_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            projects = Project.objects.filter(pk=instance.pk)
+            projects.refresh_search_vector()
+            projects.refresh_tag_array()
+            recommendations.projects_changed([instance.pk])
+        return
+    # Reverse side: instance is a SkillTag, pk_set holds project ids.
+    if action == "pre_clear":
+        instance._cleared_project_ids = list(instance.projects.values_list("pk", flat=True))
+        return
+    if action == "post_clear":
+        project_ids = getattr(instance, "_cleared_project_ids", [])
+    elif action in ("post_add", "post_remove"):
+        project_ids = pk_set
+    else:
+        return
+    projects = Project.objects.filter(pk__in=project_ids)
+    projects.refresh_search_vector()
+    projects.refresh_tag_array()
+    recommendations.projects_changed(project_ids)
+
+@receiver(post_save, sender=SkillTag)
+def refresh_search_vector_on_tag_rename(sender, instance: SkillTag, created: bool, **kwargs):
+    if not created:
+        Project.objects.filter(tags=instance).refresh_search_vector()
+
+@receiver(pre_delete, sender=SkillTag)
+def remember_tagged_projects(sender, instance: SkillTag, **kwargs):
+    instance._tagged_project_ids = list(instance.projects.values_list("pk", flat=True))
+
+@receiver(post_delete, sender=SkillTag)
+def refresh_tag_fields_on_tag_delete(sender, instance: SkillTag, **kwargs):
+    project_ids = getattr(instance, "_tagged_project_ids", [])
+    projects = Project.objects.filter(pk__in=project_ids)
+    projects.refresh_search_vector()
+    projects.refresh_tag_array()
+    recommendations.projects_changed(project_ids)
+
+RANKING_FIELDS = ("status", "looking_for_role", "owner_id")
+
+@receiver(post_init, sender=Project)
+def remember_project_ranking_fields(sender, instance: Project, **kwargs):
+    # __dict__ so deferred fields aren't loaded; None means unknown.
+    instance._ranked = tuple(instance.__dict__.get(field) for field in RANKING_FIELDS)
+
+@receiver(post_save, sender=Project)
+def invalidate_recommendations_on_project_save(sender, instance: Project, created: bool, **kwargs):
+    # Only new projects and status, looking_for_role or owner changes move rankings; tags have their own handler.
+    ranked = tuple(getattr(instance, field) for field in RANKING_FIELDS)
+    if created or None in instance._ranked or ranked != instance._ranked:
+        recommendations.projects_changed([instance.pk])
+    instance._ranked = ranked
+
+@receiver(post_delete, sender=Project)
+def invalidate_recommendations_on_project_delete(sender, instance: Project, **kwargs):
+    recommendations.projects_changed([instance.pk])
+
+@receiver(post_save, sender=User)
+def invalidate_recommendations_on_role_change(sender, instance: User, created: bool, **kwargs):
+    if not created:
+        recommendations.invalidate_user(instance.pk)
+
+@receiver(m2m_changed, sender=Profile.skills.through)
+def invalidate_recommendations_on_skills_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # Many users' skills changed but no project did: drop every cached ranking, keep the index.
+        recommendations.projects_changed([])
+    else:
+        recommendations.invalidate_user(instance.user_id)
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_cached_project(sender, instance: Project, **kwargs):
+    invalidate_tags("projects", f"project:{instance.pk}")
+
+@receiver(m2m_changed, sender=Project.tags.through)
+def invalidate_cached_project_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # A tag's project set changed; the SkillTag handlers below cover its own payload.
+        invalidate_tags("projects", *(f"project:{pk}" for pk in pk_set or ()))
+        if action == "post_clear":
+            invalidate_tags(*(f"project:{pk}" for pk in getattr(instance, "_cleared_project_ids", [])))
+    else:
+        invalidate_tags("projects", f"project:{instance.pk}")
+
+@receiver(post_save, sender=SkillTag)
+@receiver(post_delete, sender=SkillTag)
+def invalidate_cached_skills(sender, **kwargs):
+    invalidate_tags("skills")
+
+@receiver(post_save, sender=SkillTag)
+@receiver(post_delete, sender=SkillTag)
+def update_skill_autocomplete(sender, instance: SkillTag, update_fields=None, **kwargs):
+    # Indexes re-read just this tag; project_count changes reach them with the periodic rebuild.
+    if update_fields is None or {"name", "kind"}.intersection(update_fields):
+        autocomplete.tags_changed([instance.pk])
+
+@receiver(post_save, sender=Proposal)
+@receiver(post_delete, sender=Proposal)
+def invalidate_cached_proposal_count(sender, instance: Proposal, **kwargs):
+    # Project payloads carry proposal_count.
+    invalidate_tags("projects", f"project:{instance.project_id}")
+
+# Outbox events for ORM saves (ProposalQuerySet.submit and .moderate write their own; proposal
+# saves record theirs in save_proposal below). They join the caller's transaction, so views that
+# save wrap it in one.
+
+@receiver(post_init, sender=Project)
+def remember_project_status(sender, instance: Project, **kwargs):
+    instance._saved_status = instance.__dict__.get("status")
+
+@receiver(post_save, sender=Project)
+def record_project_closed(sender, instance: Project, created: bool, **kwargs):
+    if not created and instance.status == "CLOSED" and instance._saved_status not in (None, "CLOSED"):
+        events.record("project.closed", project=instance.pk, owner=instance.owner_id)
+    instance._saved_status = instance.status
+
+# Counters. Every change is a relative F() update, so concurrent writers never
+# overwrite each other's increments; reconcile_counters repairs any drift.
+
+def _count_tags(tags, delta):
+    tags.update(project_count=F("project_count") + delta)
+
+@receiver(m2m_changed, sender=Project.tags.through)
+def count_tagged_projects(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action == "post_add":
+            # Django passes only the ids it actually added.
+            _count_tags(SkillTag.objects.filter(pk__in=pk_set), 1)
+        elif action == "pre_remove":
+            _count_tags(SkillTag.objects.filter(projects=instance, pk__in=pk_set), -1)
+        elif action == "pre_clear":
+            _count_tags(SkillTag.objects.filter(projects=instance), -1)
+        else:
+            return
+    elif action == "post_add":
+        _count_tags(SkillTag.objects.filter(pk=instance.pk), len(pk_set))
+    elif action == "pre_remove":
+        _count_tags(SkillTag.objects.filter(pk=instance.pk), -instance.projects.filter(pk__in=pk_set).count())
+    elif action == "post_clear":
+        SkillTag.objects.filter(pk=instance.pk).update(project_count=0)
+    else:
+        return
+    # Skill payloads carry project_count.
+    invalidate_tags("skills")
+
+@receiver(pre_delete, sender=Project)
+def uncount_deleted_project_tags(sender, instance: Project, **kwargs):
+    # The cascade removes the through rows without m2m_changed.
+    _count_tags(SkillTag.objects.filter(projects=instance), -1)
+    invalidate_tags("skills")
+
+def _count_proposal(project_id, status, delta):
+    changes = {"proposal_count": F("proposal_count") + delta}
+    if status == "ACCEPTED":
+        changes["accepted_count"] = F("accepted_count") + delta
+    Project.objects.filter(pk=project_id).update(**changes)
+
+@receiver(post_init, sender=Proposal)
+def remember_counted_proposal(sender, instance: Proposal, **kwargs):
+    # What the counters currently reflect; __dict__ so deferred fields aren't loaded.
+    instance._counted = (instance.__dict__.get("project_id"), instance.__dict__.get("status"))
+
+@receiver(post_save, sender=Proposal)
+def save_proposal(sender, instance: Proposal, created: bool, **kwargs):
+    # One handler for the outbox event and the counters, since both compare against _counted.
+    counted, current = instance._counted, (instance.project_id, instance.status)
+    if created:
+        events.record("proposal.created", proposal=instance.pk, project=instance.project_id,
+                      submitter=instance.submitter_id, project_owner=instance.project_owner_id)
+    elif counted[1] is not None and counted[1] != instance.status:
+        events.record("proposal.status", proposal=instance.pk, project=instance.project_id,
+                      submitter=instance.submitter_id, previous=counted[1], status=instance.status)
+    if created:
+        _count_proposal(*current, 1)
+    elif None in counted:
+        Project.objects.filter(pk=instance.project_id).refresh_counters()
+    elif counted[0] != current[0]:
+        _count_proposal(*counted, -1)
+        _count_proposal(*current, 1)
+    elif (counted[1] == "ACCEPTED") != (current[1] == "ACCEPTED"):
+        delta = 1 if current[1] == "ACCEPTED" else -1
+        Project.objects.filter(pk=instance.project_id).update(accepted_count=F("accepted_count") + delta)
+    instance._counted = current
+
+@receiver(post_delete, sender=Proposal)
+def uncount_deleted_proposal(sender, instance: Proposal, **kwargs):
+    if None in instance._counted:
+        Project.objects.filter(pk=instance.project_id).refresh_counters()
+    else:
+        _count_proposal(*instance._counted, -1)
@@ -0,0 +1,582 @@
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.throttling import AnonRateThrottle
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+from accounts.models import User
+from accounts.views import MeView
+from artfit.async_views import async_read_view
+from . import autocomplete, events, recommendations
+from .caching import AnonymousResponseCacheMixin
+from .models import Notification, OutboxEvent, Project, Proposal, SkillTag
+from .views import ProjectViewSet, SkillTagViewSet
+
+def make_project(owner, **fields):
+    return Project.objects.create(owner=owner, title=fields.pop("title", "Project"), description="-", **fields)
+
+class ProjectListQueryTests(APITestCase):
+    def setUp(self):
+        tags = [SkillTag.objects.create(name=name) for name in ("Python", "Figma", "Unity")]
+        for i in range(30):
+            project = make_project(User.objects.create_user(f"owner{i}"), title=f"Project {i}")
+            project.tags.set(tags[i % 3:])
+        # Signed in, so the list isn't served from the anonymous response cache.
+        self.client.force_authenticate(User.objects.create_user("dev"))
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        for page_size in (5, 25):
+            # The page with its owners, then every project's tags in one IN query.
+            with self.subTest(page_size=page_size), self.assertNumQueries(2):
+                response = self.client.get(f"/api/projects/?page_size={page_size}")
+                self.assertEqual(len(response.data["results"]), page_size)
+                self.assertTrue(all(project["tags"] for project in response.data["results"]))
+
+class ProjectFilterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user("owner")
+        self.python = SkillTag.objects.create(name="Python", kind="TOOL")
+        self.figma = SkillTag.objects.create(name="Figma", kind="STYLE")
+        self.projects = {
+            "api": make_project(owner, looking_for_role="DEV", budget_min=100),
+            "logo": make_project(owner, looking_for_role="DES", budget_min=500),
+            "game": make_project(owner, looking_for_role="DEV", budget_min=1000, status="CLOSED"),
+            "site": make_project(owner, looking_for_role="BOTH"),
+        }
+        self.projects["api"].tags.set([self.python])
+        self.projects["logo"].tags.set([self.figma])
+        self.projects["game"].tags.set([self.python, self.figma])
+        self.client.force_authenticate(User.objects.create_user("dev"))
+
+    def names(self, query):
+        by_id = {project.pk: name for name, project in self.projects.items()}
+        return {by_id[project["id"]] for project in self.client.get(f"/api/projects/?{query}").data["results"]}
+
+    def test_filters(self):
+        cases = {
+            "status=OPEN": {"api", "logo", "site"},
+            "looking_for_role=DEV&status=OPEN": {"api"},
+            "budget_min__gte=500": {"logo", "game"},
+            f"tags={self.python.pk}": {"api", "game"},
+            f"tags={self.python.pk},{self.figma.pk}": {"api", "logo", "game"},
+            "kind=STYLE": {"logo", "game"},
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.names(query), expected)
+
+    def test_invalid_filter_value_is_rejected(self):
+        self.assertEqual(self.client.get("/api/projects/?tags=python").status_code, 400)
+
+    def test_facet_counts(self):
+        facets = self.client.get("/api/projects/facets/").data
+        self.assertEqual(facets["count"], 4)
+        self.assertEqual([(tag["name"], tag["kind"], tag["count"]) for tag in facets["tags"]],
+                         [("Figma", "STYLE", 2), ("Python", "TOOL", 2)])
+        self.assertEqual(facets["roles"], {"DEV": 2, "DES": 1, "BOTH": 1})
+        self.assertEqual(facets["status"], {"OPEN": 3, "CLOSED": 1})
+
+    def test_facet_counts_follow_the_filters(self):
+        facets = self.client.get(f"/api/projects/facets/?status=OPEN&tags={self.python.pk},{self.figma.pk}").data
+        self.assertEqual(facets["count"], 2)
+        self.assertEqual([(tag["name"], tag["count"]) for tag in facets["tags"]], [("Figma", 1), ("Python", 1)])
+        self.assertEqual(facets["roles"], {"DEV": 1, "DES": 1})
+        self.assertEqual(facets["status"], {"OPEN": 2})
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner")
+        python, figma = SkillTag.objects.create(name="Python"), SkillTag.objects.create(name="Figma")
+        for i in range(3):
+            make_project(self.owner, title=f"Project {i}").tags.set([python, figma])
+        self.owner.profile.skills.set([python])
+        self.client.force_authenticate(self.owner)
+
+    def test_fields_keeps_only_those_and_loads_only_their_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/projects/?fields=id,title")
+        self.assertEqual([set(project) for project in response.data["results"]], [{"id", "title"}] * 3)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"description"', queries[0]["sql"])
+
+    def test_omit_drops_fields(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/projects/?omit=description,tags,owner_username")
+        project = response.data["results"][0]
+        self.assertNotIn("description", project)
+        self.assertNotIn("tags", project)
+        self.assertIn("title", project)
+
+    def test_expand_nests_the_related_object(self):
+        response = self.client.get("/api/projects/?fields=id,owner&expand=owner")
+        self.assertEqual(response.data["results"][0]["owner"], {"id": self.owner.pk, "username": "owner", "role": self.owner.role})
+
+    def test_nested_many_relations_are_prefetched_once(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/projects/?fields=id,tags")
+        self.assertCountEqual([tag["name"] for tag in response.data["results"][0]["tags"]], ["Figma", "Python"])
+        response = self.client.get("/api/accounts/me/?fields=id,skills")
+        self.assertEqual([tag["name"] for tag in response.data["skills"]], ["Python"])
+
+    def test_unknown_field_names_are_a_400(self):
+        response = self.client.get("/api/projects/?fields=id,nope&omit=zap&expand=title")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {"fields", "omit", "expand"})
+        self.assertIn("nope", str(response.data["fields"][0]))
+
+class BulkImportTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner")
+        self.tag = SkillTag.objects.create(name="Python")
+        self.client.force_authenticate(self.owner)
+
+    def row(self, title, **fields):
+        return {"title": title, "description": "-", **fields}
+
+    def test_invalid_rows_are_reported_and_the_rest_created(self):
+        rows = [
+            self.row("Valid", tag_ids=[self.tag.pk]),
+            {"description": "no title"},
+            "not an object",
+            self.row("Unknown tag", tag_ids=[self.tag.pk, 999999]),
+            self.row("Also valid"),
+        ]
+        with mock.patch("marketplace.views.IMPORT_BATCH", 2):
+            response = self.client.post("/api/projects/import/", rows, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(error["row"], list(error["errors"])) for error in response.data["errors"]],
+            [(1, ["title"]), (2, ["non_field_errors"]), (3, ["tag_ids"])],
+        )
+        self.assertEqual(response.data["errors"][2]["errors"]["tag_ids"], ['Invalid pk "999999" - object does not exist.'])
+        projects = Project.objects.filter(pk__in=response.data["created"])
+        self.assertCountEqual(projects.values_list("title", "owner_id"), [("Valid", self.owner.pk), ("Also valid", self.owner.pk)])
+        self.assertEqual(list(projects.get(title="Valid").tag_array), [self.tag.pk])
+        self.assertEqual(SkillTag.objects.get().project_count, 1)
+
+    def test_atomic_import_writes_nothing_when_a_row_is_invalid(self):
+        rows = [self.row("Valid"), self.row("")]
+        with mock.patch("marketplace.views.IMPORT_BATCH", 1):
+            response = self.client.post("/api/projects/import/?atomic=true", rows, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["created"], [])
+        self.assertEqual([error["row"] for error in response.data["errors"]], [1])
+        self.assertFalse(Project.objects.exists())
+
+    def test_ndjson_stream(self):
+        body = "\n".join([json.dumps(self.row("First")), "{broken", json.dumps(self.row("Second"))])
+        response = self.client.post("/api/projects/import/", body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["created"]), 2)
+        self.assertEqual(response.data["errors"][0]["row"], 1)
+        self.assertTrue(str(response.data["errors"][0]["errors"]["non_field_errors"][0]).startswith("Line 2: "))
+
+    def test_a_json_object_is_rejected(self):
+        self.assertEqual(self.client.post("/api/projects/import/", self.row("Lone"), format="json").status_code, 400)
+
+class AutocompleteTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(setattr, autocomplete, "_index", None)
+        for name, kind, count in [("Python", "TOOL", 5), ("PyTorch", "TOOL", 9), ("Pixel art", "STYLE", 2), ("Pygame", "GENRE", 5)]:
+            SkillTag.objects.create(name=name, kind=kind)
+            SkillTag.objects.filter(name=name).update(project_count=count)
+
+    def names(self, query, kind=None, limit=autocomplete.MAX_RESULTS):
+        return [tag["name"] for tag in autocomplete.get_index().lookup(query, kind, limit)]
+
+    def test_word_prefixes_ranked_by_popularity_then_name(self):
+        self.assertEqual(self.names("py"), ["PyTorch", "Pygame", "Python"])
+        self.assertEqual(self.names("  PY "), ["PyTorch", "Pygame", "Python"])
+        self.assertEqual(self.names("py", kind="GENRE"), ["Pygame"])
+        self.assertEqual(self.names("py", limit=1), ["PyTorch"])
+        self.assertEqual(self.names("art"), ["Pixel art"])
+        self.assertEqual(self.names("ixel"), [])
+        self.assertEqual(autocomplete.get_index().lookup("art")[0].keys(), {"id", "name", "kind"})
+
+    def test_tag_changes_update_single_entries(self):
+        built = autocomplete.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = SkillTag.objects.create(name="PySpark")
+        with self.captureOnCommitCallbacks(execute=True):
+            SkillTag.objects.filter(name="Python").get().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name, tag.kind = "Spark", "GENRE"
+            tag.save()
+        # Only the changed tags are re-read.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names("py"), ["PyTorch", "Pygame"])
+        self.assertEqual(self.names("spark", kind="GENRE"), ["Spark"])
+        self.assertEqual(built.lookup("py")[2]["name"], "Python")
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.save(update_fields=["project_count"])
+        self.assertFalse(autocomplete.get_index().is_stale(autocomplete._version()))
+
+class RecommendationVersionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("owner")
+        self.project = make_project(self.owner)
+
+    def assertBumps(self, bumped, **changes):
+        version = recommendations._version()
+        project = Project.objects.get(pk=self.project.pk)
+        for field, value in changes.items():
+            setattr(project, field, value)
+        # Versions move once the change commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            project.save()
+        self.assertEqual(recommendations._version(), version + bumped)
+
+    def test_only_ranking_changes_bump_the_version(self):
+        self.assertBumps(False, title="Renamed", budget_max=500)
+        self.assertBumps(True, status="CLOSED")
+        self.assertBumps(True, looking_for_role="DEV")
+        self.assertBumps(True, owner=User.objects.create_user("new-owner"))
+
+    def test_creating_a_project_with_tags_bumps_the_version_once(self):
+        tags = [SkillTag.objects.create(name=name).pk for name in ("Python", "Figma")]
+        self.client.force_authenticate(self.owner)
+        version = recommendations._version()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/projects/", {"title": "New", "description": "-", "tag_ids": tags}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(recommendations._version(), version + 1)
+
+class RecommendationRankingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        recommendations._index = None
+        self.python, self.figma, self.unity = (SkillTag.objects.create(name=name) for name in ("Python", "Figma", "Unity"))
+        self.dev = User.objects.create_user("dev", role="DEV")
+        self.dev.profile.skills.set([self.python, self.figma])
+        self.owner = User.objects.create_user("owner")
+
+    def project(self, role, *tags, owner=None, **fields):
+        project = make_project(owner or self.owner, looking_for_role=role, **fields)
+        project.tags.set(tags)
+        return project
+
+    def test_bands_by_overlap_then_role_then_newest_without_own_projects(self):
+        both_dev = self.project("DEV", self.python, self.figma)
+        both_des = self.project("DES", self.python, self.figma)
+        one_dev = self.project("DEV", self.python)
+        one_any = self.project("BOTH", self.figma)
+        one_des = self.project("DES", self.python, self.unity)
+        role_only = self.project("DEV", self.unity)
+        self.project("DES", self.unity)
+        self.project("DEV", self.python, self.figma, owner=self.dev)
+        self.project("DEV", self.python, self.figma, status="CLOSED")
+        ranked = recommendations.rank_projects(self.dev)
+        self.assertEqual(ranked, [p.pk for p in (both_dev, both_des, one_any, one_dev, one_des, role_only)])
+
+    def test_an_index_catches_up_from_the_changed_rows(self):
+        kept, closed, retagged, deleted = (self.project("DEV", self.python) for _ in range(4))
+        recommendations.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            closed.status = "CLOSED"
+            closed.save()
+            retagged.tags.set([self.python, self.figma])
+            deleted.delete()
+            added = self.project("DEV", self.figma, self.python)
+        # Only the changed rows are read, not every OPEN project.
+        with self.assertNumQueries(1):
+            index = recommendations.get_index()
+        self.assertEqual(index.version, recommendations._version())
+        ranked = index.rank([self.python.pk, self.figma.pk], ["DEV", "BOTH"], self.dev.pk, 10)
+        self.assertEqual(ranked, [added.pk, retagged.pk, kept.pk])
+        rebuilt = recommendations.ProjectTagIndex(index.version)
+        self.assertEqual(rebuilt.rank([self.python.pk, self.figma.pk], ["DEV", "BOTH"], self.dev.pk, 10), ranked)
+
+    def test_an_unlogged_bump_rebuilds_the_index(self):
+        project = self.project("DEV", self.python)
+        stale = recommendations.get_index()
+        Project.objects.filter(pk=project.pk).update(looking_for_role="DES")
+        recommendations.bump_version()
+        index = recommendations.get_index()
+        self.assertIsNot(index, stale)
+        self.assertEqual(index.rank([self.python.pk], ["DEV"], self.dev.pk, 10), [project.pk])
+        self.assertEqual(index.rank([], ["DEV"], self.dev.pk, 10), [])
+
+class ProposalModerationTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner")
+        self.project = make_project(self.owner)
+        self.proposal = Proposal.objects.create(project=self.project, submitter=User.objects.create_user("dev"), cover_letter="Hi")
+        self.client.force_authenticate(self.owner)
+
+    def moderate(self, **data):
+        return self.client.post("/api/proposals/moderate/", {"project": self.project.pk, "status": "ACCEPTED", **data}, format="json")
+
+    def test_empty_ids_writes_nothing(self):
+        response = self.moderate(ids=[])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["rejected_pending"], 0)
+        self.proposal.refresh_from_db()
+        self.assertEqual(self.proposal.status, "PENDING")
+
+    def test_empty_ids_with_reject_pending_rejects_the_rest(self):
+        response = self.moderate(ids=[], reject_pending=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["rejected_pending"], 1)
+        self.proposal.refresh_from_db()
+        self.assertEqual(self.proposal.status, "REJECTED")
+
+class ProposalUpdateTests(APITestCase):
+    def setUp(self):
+        owner = User.objects.create_user("owner")
+        self.project = make_project(owner)
+        self.submitter = User.objects.create_user("dev")
+        self.proposal = Proposal.objects.create(project=self.project, submitter=self.submitter, cover_letter="Hi")
+        self.client.force_authenticate(self.submitter)
+
+    def test_a_proposal_cannot_move_to_another_project(self):
+        closed = make_project(self.project.owner, status="CLOSED")
+        response = self.client.patch(f"/api/proposals/{self.proposal.pk}/", {"project": closed.pk, "cover_letter": "Hello"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["project"], self.project.pk)
+        self.proposal.refresh_from_db()
+        self.assertEqual((self.proposal.project_id, self.proposal.cover_letter), (self.project.pk, "Hello"))
+
+    def test_save_looks_up_the_owner_only_when_the_project_changes(self):
+        proposal = Proposal.objects.get(pk=self.proposal.pk)
+        proposal.cover_letter = "Hello"
+        with CaptureQueriesContext(connection) as ctx:
+            proposal.save()
+        self.assertFalse([q["sql"] for q in ctx if 'FROM "marketplace_project"' in q["sql"]])
+        other = make_project(User.objects.create_user("other"))
+        proposal.project_id = other.pk
+        proposal.save()
+        self.assertEqual(Proposal.objects.get(pk=proposal.pk).project_owner_id, other.owner_id)
+
+class CounterTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner")
+        self.project = make_project(self.owner)
+        self.submitter = User.objects.create_user("dev")
+
+    def counts(self, project=None):
+        project = Project.objects.get(pk=(project or self.project).pk)
+        return project.proposal_count, project.accepted_count
+
+    def test_proposal_saves_move_the_counters_and_record_events(self):
+        proposal = Proposal.objects.create(project=self.project, submitter=self.submitter, cover_letter="Hi")
+        self.assertEqual(self.counts(), (1, 0))
+        proposal.status = "ACCEPTED"
+        proposal.save()
+        self.assertEqual(self.counts(), (1, 1))
+        other = make_project(self.owner)
+        proposal.project = other
+        proposal.save()
+        self.assertEqual((self.counts(), self.counts(other)), ((0, 0), (1, 1)))
+        # Loaded without status, the counters can't be adjusted by a delta and are recomputed instead.
+        deferred = Proposal.objects.only("id", "project").get(pk=proposal.pk)
+        deferred.status = "REJECTED"
+        deferred.save()
+        self.assertEqual(self.counts(other), (1, 0))
+        proposal.refresh_from_db()
+        proposal.delete()
+        self.assertEqual(self.counts(other), (0, 0))
+        self.assertEqual(
+            [(event.kind, event.payload.get("status")) for event in OutboxEvent.objects.order_by("id")],
+            [("proposal.created", None), ("proposal.status", "ACCEPTED")],
+        )
+
+    def test_tag_changes_move_project_count(self):
+        python, figma = SkillTag.objects.create(name="Python"), SkillTag.objects.create(name="Figma")
+        other = make_project(self.owner)
+        self.project.tags.set([python, figma])
+        other.tags.add(python)
+        figma.projects.add(other)
+        counts = lambda: dict(SkillTag.objects.values_list("name", "project_count"))
+        self.assertEqual(counts(), {"Python": 2, "Figma": 2})
+        self.project.tags.remove(figma)
+        python.projects.clear()
+        self.assertEqual(counts(), {"Python": 0, "Figma": 1})
+        other.delete()
+        self.assertEqual(counts(), {"Python": 0, "Figma": 0})
+
+    def test_reconcile_counters_fixes_drift(self):
+        tag = SkillTag.objects.create(name="Python")
+        self.project.tags.add(tag)
+        Proposal.objects.create(project=self.project, submitter=self.submitter, cover_letter="Hi", status="ACCEPTED")
+        Project.objects.update(proposal_count=5, accepted_count=0)
+        SkillTag.objects.update(project_count=3)
+        out = StringIO()
+        call_command("reconcile_counters", "--dry-run", stdout=out)
+        self.assertIn("would fix 1 projects, would fix 1 skills", out.getvalue())
+        self.assertEqual(self.counts(), (5, 0))
+        call_command("reconcile_counters", "--batch-size", "1", stdout=out)
+        self.assertEqual(self.counts(), (1, 1))
+        self.assertEqual(SkillTag.objects.get().project_count, 1)
+
+class ConcurrentSubmitTests(APITransactionTestCase):
+    REPEATS = 6
+
+    def setUp(self):
+        self.project = make_project(User.objects.create_user("owner"))
+        self.submitter = User.objects.create_user("dev")
+
+    def submit_in_parallel(self, **headers):
+        barrier = threading.Barrier(self.REPEATS)
+        def submit(_):
+            client = APIClient()
+            client.force_authenticate(self.submitter)
+            barrier.wait()
+            try:
+                return client.post("/api/proposals/", {"project": self.project.pk, "cover_letter": "Hi"}, format="json", **headers)
+            finally:
+                connections.close_all()
+        with ThreadPoolExecutor(self.REPEATS) as pool:
+            return list(pool.map(submit, range(self.REPEATS)))
+
+    def test_replays_with_a_key_get_the_original_proposal(self):
+        responses = self.submit_in_parallel(HTTP_IDEMPOTENCY_KEY="retry-1")
+        self.assertEqual(Counter(r.status_code for r in responses), {201: 1, 200: self.REPEATS - 1})
+        self.assertEqual(len({r.data["id"] for r in responses}), 1)
+        self.assertEqual(Proposal.objects.filter(project=self.project).count(), 1)
+
+    def test_duplicates_without_a_key_conflict(self):
+        responses = self.submit_in_parallel()
+        self.assertEqual(Counter(r.status_code for r in responses), {201: 1, 409: self.REPEATS - 1})
+        self.assertEqual(Proposal.objects.filter(project=self.project).count(), 1)
+
+class EventTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner")
+        self.submitter = User.objects.create_user("dev")
+        self.project = make_project(self.owner)
+
+    def notifications(self, user):
+        return [(n.kind, n.payload.get("status")) for n in Notification.objects.filter(user=user).order_by("id")]
+
+    def make_events(self):
+        proposal = Proposal.objects.create(project=self.project, submitter=self.submitter, cover_letter="Hi")
+        for status in ("ACCEPTED", "REJECTED"):
+            proposal.status = status
+            proposal.save()
+        self.project.status = "CLOSED"
+        self.project.save()
+
+    def test_drain_delivers_in_outbox_order(self):
+        self.make_events()
+        self.assertEqual(events.drain(batch_size=2) + events.drain(batch_size=2), 4)
+        self.assertEqual(self.notifications(self.owner), [("proposal.created", None)])
+        self.assertEqual(self.notifications(self.submitter),
+                         [("proposal.status", "ACCEPTED"), ("proposal.status", "REJECTED"), ("project.closed", None)])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_draining_again_delivers_nothing_twice(self):
+        self.make_events()
+        events.drain()
+        delivered = Notification.objects.count()
+        self.assertEqual(events.drain(), 0)
+        self.assertEqual(Notification.objects.count(), delivered)
+        # Recipients deleted before the drain are skipped instead of failing the batch.
+        Proposal.objects.create(project=make_project(self.owner), submitter=self.submitter, cover_letter="Hi")
+        self.owner.delete()
+        self.assertEqual(events.drain(), 1)
+        # The owner's earlier notification went with them; nothing was added.
+        self.assertEqual(Notification.objects.count(), delivered - 1)
+
+    def test_sync_view_never_waits(self):
+        self.client.force_authenticate(self.submitter)
+        start = time.monotonic()
+        response = self.client.get("/api/events/?wait=5")
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(response.data, {"results": [], "cursor": 0})
+
+    def test_cursor_pages_through_every_event_once(self):
+        self.make_events()
+        events.drain()
+        self.client.force_authenticate(self.submitter)
+        seen, cursor = [], 0
+        with mock.patch.object(events, "MAX_RESULTS", 2):
+            while (response := self.client.get(f"/api/events/?cursor={cursor}").data)["results"]:
+                self.assertLessEqual(len(response["results"]), 2)
+                seen += [event["id"] for event in response["results"]]
+                cursor = response["cursor"]
+        self.assertEqual(seen, list(Notification.objects.filter(user=self.submitter).order_by("id").values_list("id", flat=True)))
+        self.assertEqual(self.client.get(f"/api/events/?cursor={cursor}").data, {"results": [], "cursor": cursor})
+        self.assertEqual(self.client.get("/api/events/?cursor=abc").status_code, 400)
+
+class AnonymousResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user("owner")
+        for i in range(3):
+            make_project(owner, title=f"Project {i}")
+
+    def test_pagination_links_are_not_shared_across_hosts(self):
+        forged = self.client.get("/api/projects/?page_size=1", HTTP_HOST="evil.example")
+        self.assertTrue(forged.data["next"].startswith("http://evil.example/"))
+        response = self.client.get("/api/projects/?page_size=1")
+        self.assertTrue(response.data["next"].startswith("http://testserver/"))
+
+    def test_a_view_must_declare_its_cache_tags(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "UntaggedViewSet must set cache_tags."):
+            type("UntaggedViewSet", (AnonymousResponseCacheMixin, viewsets.ReadOnlyModelViewSet), {})
+
+class TwoPerMinute(AnonRateThrottle):
+    rate = "2/min"
+
+class ThrottledSkillTagViewSet(SkillTagViewSet):
+    throttle_classes = [TwoPerMinute]
+
+# The async views regardless of ASYNC_READ_VIEWS, which the project urlconf reads at import.
+urlpatterns = [
+    path("projects/<int:pk>/", async_read_view(ProjectViewSet, {"get": "retrieve"})),
+    path("skills/", async_read_view(ThrottledSkillTagViewSet, {"get": "list"})),
+    path("me/", async_read_view(MeView)),
+]
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncReadViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.project = make_project(User.objects.create_user("owner"))
+
+    async def test_retrieve_and_a_missing_object(self):
+        response = await self.async_client.get(f"/projects/{self.project.pk}/")
+        self.assertEqual((response.status_code, response.json()["title"]), (200, "Project"))
+        response = await self.async_client.get(f"/projects/{self.project.pk + 1}/")
+        self.assertEqual((response.status_code, response.json()), (404, {"detail": "No Project matches the given query."}))
+
+    async def test_a_bad_or_missing_token_is_refused(self):
+        response = await self.async_client.get("/me/", headers={"Authorization": "Bearer not-a-token"})
+        self.assertEqual((response.status_code, response.json()["code"]), (401, "token_not_valid"))
+        self.assertEqual((await self.async_client.get("/me/")).status_code, 401)
+
+    async def test_throttles_apply(self):
+        statuses = [(await self.async_client.get("/skills/")).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+class ReplicaRoutingTests(APITestCase):
+    def fills_shared_cache(self, view_class, action, user):
+        return view_class(action=action).fills_shared_cache(SimpleNamespace(user=user))
+
+    def test_reads_filling_shared_caches_stay_on_the_primary(self):
+        user, anonymous = User.objects.create_user("dev"), AnonymousUser()
+        self.assertTrue(self.fills_shared_cache(ProjectViewSet, "list", anonymous))
+        self.assertTrue(self.fills_shared_cache(ProjectViewSet, "retrieve", anonymous))
+        self.assertTrue(self.fills_shared_cache(ProjectViewSet, "facets", user))
+        self.assertTrue(self.fills_shared_cache(ProjectViewSet, "recommended", user))
+        self.assertTrue(self.fills_shared_cache(SkillTagViewSet, "autocomplete", anonymous))
+        self.assertFalse(self.fills_shared_cache(ProjectViewSet, "list", user))
+        self.assertFalse(self.fills_shared_cache(SkillTagViewSet, "list", user))
@@ -1,7 +1,22 @@
+from django.conf import settings
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import SkillTagViewSet, ProjectViewSet, ProposalViewSet
+from artfit.async_views import async_read_view
+from .views import SkillTagViewSet, ProjectViewSet, ProposalViewSet, EventViewSet
 router = DefaultRouter()
 router.register(r"skills", SkillTagViewSet)
 router.register(r"projects", ProjectViewSet)
 router.register(r"proposals", ProposalViewSet)
+router.register(r"events", EventViewSet, basename="event")
 urlpatterns = router.urls
+if settings.ASYNC_READ_VIEWS:
+    # Ahead of the router so GETs reach the async handlers; other methods fall through to the viewsets.
+    list_actions = {"get": "list", "post": "create"}
+    detail_actions = {"get": "retrieve", "put": "update", "patch": "partial_update", "delete": "destroy"}
+    urlpatterns = [
+        path("skills/", async_read_view(SkillTagViewSet, list_actions), name="skilltag-list"),
+        path("skills/autocomplete/", async_read_view(SkillTagViewSet, {"get": "autocomplete"}), name="skilltag-autocomplete"),
+        path("projects/", async_read_view(ProjectViewSet, list_actions), name="project-list"),
+        path("projects/<int:pk>/", async_read_view(ProjectViewSet, detail_actions), name="project-detail"),
+        path("events/", async_read_view(EventViewSet, {"get": "list"}), name="event-list"),
+    ] + urlpatterns
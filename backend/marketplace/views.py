@@ -1,34 +1,340 @@
-from rest_framework import viewsets, permissions, filters
-from django.db import models
+from collections import Counter
+from contextlib import nullcontext
+from itertools import islice
+from rest_framework import viewsets, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError, PermissionDenied, ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django_filters.rest_framework import DjangoFilterBackend
+from artfit.async_views import AsyncReadMixin, db_slots
+from artfit.db_routing import ReplicaReadMixin
+from artfit.fieldsets import SparseFieldsetViewMixin
+from artfit.pagination import NameCursorPagination, RankedCursorPagination
+from artfit.parsers import NDJSONParser
+from . import autocomplete, events, recommendations
+from .caching import AnonymousResponseCacheMixin, invalidate_tags, response_cache_key
+from .filters import CounterOrderingFilter, ProjectFilter, ProjectSearchFilter
 from .models import SkillTag, Project, Proposal
-from .serializers import SkillTagSerializer, ProjectSerializer, ProposalSerializer
+from .recommendations import MAX_RESULTS, recommended_project_ids
+from .serializers import (
+    SkillTagSerializer, ProjectSerializer, ProjectImportSerializer, ProposalSerializer, ProposalSubmissionSerializer,
+    ProposalModerationSerializer, NotificationSerializer,
+)
+
+IMPORT_BATCH = 500
+UNKNOWN_TAG = 'Invalid pk "{pk}" - object does not exist.'
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS: return True
-        owner = getattr(obj, "owner", getattr(obj, "submitter", None))
-        return owner == request.user
+        owner_id = getattr(obj, "owner_id", getattr(obj, "submitter_id", None))
+        return owner_id == request.user.pk
 
-class SkillTagViewSet(viewsets.ModelViewSet):
+class SkillTagViewSet(AnonymousResponseCacheMixin, ReplicaReadMixin, AsyncReadMixin, viewsets.ModelViewSet):
     queryset = SkillTag.objects.all().order_by("name")
     serializer_class = SkillTagSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [filters.SearchFilter]
+    pagination_class = NameCursorPagination
+    filter_backends = [filters.SearchFilter, CounterOrderingFilter]
     search_fields = ["name","kind"]
+    counter_ordering_fields = ["project_count"]
+    # The in-process autocomplete index is built from whatever the request reads.
+    shared_cache_actions = ["autocomplete"]
+    cache_tags = ["skills"]
+
+    @action(detail=False, pagination_class=None, filter_backends=[])
+    def autocomplete(self, request):
+        """Most popular tags with a word starting with ?q=, optionally of one ?kind=, from the in-process index."""
+        return Response(autocomplete.get_index().lookup(*self.autocomplete_params(request)))
+
+    async def aautocomplete(self, request):
+        return Response((await autocomplete.aget_index()).lookup(*self.autocomplete_params(request)))
 
-class ProjectViewSet(viewsets.ModelViewSet):
-    queryset = Project.objects.all().order_by("-created_at")
+    def autocomplete_params(self, request):
+        kind = request.query_params.get("kind") or None
+        if kind is not None and kind not in dict(SkillTag.KIND_CHOICES):
+            raise ValidationError({"kind": [f"Expected one of: {', '.join(dict(SkillTag.KIND_CHOICES))}."]})
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", autocomplete.MAX_RESULTS)), autocomplete.MAX_RESULTS))
+        except ValueError:
+            limit = autocomplete.MAX_RESULTS
+        return request.query_params.get("q", ""), kind, limit
+
+class ProjectViewSet(AnonymousResponseCacheMixin, SparseFieldsetViewMixin, ReplicaReadMixin, AsyncReadMixin,
+                     viewsets.ModelViewSet):
+    # owner and tags are loaded up front and the proposal counts are columns,
+    # so a page costs a fixed number of queries regardless of its size.
+    # ?fields= trims the columns and relations that get loaded (artfit.fieldsets).
+    queryset = Project.objects.select_related("owner").prefetch_related("tags").order_by("-created_at")
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["title","description","looking_for_role","tags__name"]
+    pagination_class = RankedCursorPagination
+    # Searches title, description, looking_for_role and tag names via Project.search_vector.
+    filter_backends = [ProjectSearchFilter, DjangoFilterBackend, CounterOrderingFilter]
+    filterset_class = ProjectFilter
+    counter_ordering_fields = ["proposal_count", "accepted_count"]
+    # Facet counts and the recommendation index are cached for every user.
+    shared_cache_actions = ["facets", "recommended"]
+    # Project payloads embed tag names, so they also depend on "skills".
+    cache_tags = ["projects", "skills"]
+
+    def get_cache_tags(self):
+        # One project only goes stale with its own row or a tag name.
+        if self.action == "retrieve":
+            return [f"project:{self.kwargs['pk']}", "skills"]
+        return super().get_cache_tags()
+
+    def perform_create(self, serializer):
+        # The project and then its tags are saved; rankings move once, after both.
+        with recommendations.batched(), transaction.atomic():
+            serializer.save()
+
+    def perform_update(self, serializer):
+        # Closing a project records its outbox event (marketplace.signals) in the same transaction.
+        with recommendations.batched(), transaction.atomic():
+            serializer.save()
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated], pagination_class=None, filter_backends=[])
+    def recommended(self, request):
+        """OPEN projects ranked by skill overlap and role match for the current user."""
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 20)), MAX_RESULTS))
+        except ValueError:
+            limit = 20
+        ids = recommended_project_ids(request.user, limit)
+        projects = self.get_queryset().in_bulk(ids)
+        ordered = [projects[pk] for pk in ids if pk in projects]
+        return Response(self.get_serializer(ordered, many=True).data)
+
+    @action(detail=False, pagination_class=None)
+    def facets(self, request):
+        """
+        Total, tag, role and status counts for the projects matching the list's
+        search and filters. Cached for every user, not just anonymous ones,
+        since the counts don't depend on who asks.
+        """
+        key = response_cache_key(request, self.get_cache_tags())
+        entry = cache.get(key)
+        if entry is None:
+            data = self.filter_queryset(Project.objects.all()).facet_counts()
+            entry = (self._etag(data), data)
+            cache.set(key, entry, self.cache_timeout)
+        return self._conditional_response(request, entry, None)
+
+    @action(detail=False, methods=["post"], url_path="import", permission_classes=[permissions.IsAuthenticated],
+            parser_classes=[JSONParser, NDJSONParser])
+    def bulk_import(self, request):
+        """
+        Create projects owned by the user from a JSON array of ProjectSerializer
+        rows, or from an application/x-ndjson stream with one row per line,
+        which is read as it is consumed so memory stays bounded. Rows are
+        validated and written IMPORT_BATCH at a time; invalid rows are reported
+        by position and skipped. With ?atomic=true nothing is written unless
+        every row is valid.
+        """
+        rows = request.data
+        if isinstance(rows, dict) or not hasattr(rows, "__iter__"):
+            raise ParseError("Expected a JSON array or NDJSON rows.")
+        rows, atomic = enumerate(rows), request.query_params.get("atomic") in ("1", "true")
+        created, errors = [], []
+        with transaction.atomic() if atomic else nullcontext():
+            while batch := list(islice(rows, IMPORT_BATCH)):
+                valid = _validate_import_batch(batch, errors)
+                if not (atomic and errors):
+                    created += _create_import_batch(valid, request.user.pk)
+            if atomic and errors:
+                transaction.set_rollback(True)
+                created = []
+        if created:
+            # bulk_create skips the signals that keep these caches honest.
+            invalidate_tags("projects", "skills")
+            recommendations.projects_changed(created)
+        errors.sort(key=lambda error: error["row"])
+        return Response({"created": created, "errors": errors},
+                        status=status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST)
 
-class ProposalViewSet(viewsets.ModelViewSet):
+def _validate_import_batch(batch, errors):
+    """Validated rows of a [(position, row)] batch; appends the rest to errors."""
+    valid = []
+    for position, row in batch:
+        if isinstance(row, ParseError):
+            errors.append({"row": position, "errors": {"non_field_errors": [row.detail]}})
+            continue
+        if not isinstance(row, dict):
+            errors.append({"row": position, "errors": {"non_field_errors": ["Expected a JSON object."]}})
+            continue
+        serializer = ProjectImportSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((position, serializer.validated_data))
+        else:
+            errors.append({"row": position, "errors": serializer.errors})
+    tags = SkillTag.objects.in_bulk({pk for _, data in valid for pk in data["tag_ids"]})
+    resolved = []
+    for position, data in valid:
+        unknown = [pk for pk in data["tag_ids"] if pk not in tags]
+        if unknown:
+            errors.append({"row": position, "errors": {"tag_ids": [UNKNOWN_TAG.format(pk=pk) for pk in unknown]}})
+        else:
+            resolved.append(data)
+    return resolved
+
+def _create_import_batch(rows, owner_id):
+    """bulk_create the projects and their tag links; returns the new ids."""
+    if not rows:
+        return []
+    Through = Project.tags.through
+    with transaction.atomic():
+        projects = Project.objects.bulk_create([
+            Project(owner_id=owner_id, **{field: value for field, value in data.items() if field != "tag_ids"})
+            for data in rows
+        ])
+        links = Through.objects.bulk_create([
+            Through(project_id=project.id, skilltag_id=tag_id)
+            for project, data in zip(projects, rows) for tag_id in dict.fromkeys(data["tag_ids"])
+        ])
+        # bulk_create skips m2m_changed: one project_count increment per distinct amount.
+        by_delta = {}
+        for tag_id, n in Counter(link.skilltag_id for link in links).items():
+            by_delta.setdefault(n, []).append(tag_id)
+        for n, tag_ids in by_delta.items():
+            SkillTag.objects.filter(pk__in=tag_ids).update(project_count=models.F("project_count") + n)
+        batch = Project.objects.filter(pk__in=[p.id for p in projects])
+        batch.refresh_search_vector()
+        batch.refresh_tag_array()
+    return [p.id for p in projects]
+
+class ProposalViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    # A user sees the proposals they sent (outbox) and the ones sent to their
+    # projects (inbox); ?box=inbox or ?box=outbox narrows to one of them. Both
+    # sides are columns on the proposal row with a (user, -created_at, -id)
+    # index each, so neither needs a join or DISTINCT: a box is a range scan
+    # in cursor order, and the two together are a BitmapOr of those indexes.
+    BOXES = {"inbox": "project_owner_id", "outbox": "submitter_id"}
     queryset = Proposal.objects.all().order_by("-created_at")
     serializer_class = ProposalSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
     def get_queryset(self):
         qs = super().get_queryset()
-        if self.request.user.is_authenticated:
-            return qs.filter(models.Q(submitter=self.request.user) | models.Q(project__owner=self.request.user)).distinct()
-        return qs.none()
+        if not self.request.user.is_authenticated:
+            return qs.none()
+        user_id = self.request.user.pk
+        box = self.request.query_params.get("box")
+        if not box:
+            return qs.filter(models.Q(submitter_id=user_id) | models.Q(project_owner_id=user_id))
+        if box not in self.BOXES:
+            raise ValidationError({"box": [f"Expected one of: {', '.join(self.BOXES)}."]})
+        return qs.filter(**{self.BOXES[box]: user_id})
+
+    def create(self, request, *args, **kwargs):
+        """
+        Submit a proposal in a single statement (ProposalQuerySet.submit), so
+        a double-submit or a race with the project closing can't fail halfway.
+        A retry carrying the Idempotency-Key of the original request gets the
+        original proposal back (200, Idempotent-Replayed: true); a second
+        submission without it is a 409.
+        """
+        serializer = ProposalSubmissionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        key = request.headers.get("Idempotency-Key")
+        if key is not None and not 0 < len(key) <= 255:
+            raise ValidationError({"Idempotency-Key": ["Expected 1 to 255 characters."]})
+        try:
+            project_status, proposal, created = Proposal.objects.submit(
+                data["project"], request.user.pk, data["cover_letter"], key)
+        except IntegrityError:
+            return Response({"detail": "This Idempotency-Key was already used for another project."},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if project_status is None:
+            raise ValidationError({"project": [f'Invalid pk "{data["project"]}" - object does not exist.']})
+        if proposal is None:
+            raise ValidationError({"project": ["This project is not accepting proposals."]})
+        body = self.get_serializer(proposal).data
+        if created:
+            # The INSERT skips the signals that invalidate cached project payloads.
+            invalidate_tags("projects", f"project:{proposal.project_id}")
+            return Response(body, status=status.HTTP_201_CREATED, headers=self.get_success_headers(body))
+        if key is None or key != proposal.idempotency_key:
+            return Response({"detail": "You have already submitted a proposal for this project.", "id": proposal.pk},
+                            status=status.HTTP_409_CONFLICT)
+        if data["cover_letter"] != proposal.cover_letter:
+            return Response({"detail": "This Idempotency-Key was already used with a different request body."},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        return Response(body, headers={"Idempotent-Replayed": "true"})
+
+    @action(detail=False, methods=["post"])
+    def moderate(self, request):
+        """
+        Accept or reject `ids` on one of the user's projects in a single UPDATE.
+        reject_pending also rejects the project's other PENDING proposals and
+        close_project closes it. Reports the outcome of every requested id.
+        """
+        serializer = ProposalModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        project = data["project"]
+        if project.owner_id != request.user.pk:
+            raise PermissionDenied("Only the project owner can moderate its proposals.")
+        ids = list(dict.fromkeys(data["ids"]))
+        with transaction.atomic():
+            written = Proposal.objects.filter(project=project).moderate(ids, data["status"], data["reject_pending"])
+            # The UPDATE skips the signals that keep accepted_count.
+            accepted = sum((current == "ACCEPTED") - (previous == "ACCEPTED") for previous, current in written.values())
+            if accepted:
+                Project.objects.filter(pk=project.pk).update(accepted_count=models.F("accepted_count") + accepted)
+                invalidate_tags("projects", f"project:{project.pk}")
+            if data["close_project"] and project.status != "CLOSED":
+                project.status = "CLOSED"
+                project.save(update_fields=["status"])
+        return Response({
+            "project": project.pk,
+            "project_status": project.status,
+            "results": [
+                {"id": pk, "status": written[pk][1]} if pk in written else {"id": pk, "error": "not_found"} for pk in ids
+            ],
+            "rejected_pending": len(written.keys() - set(ids)),
+        })
+
+class EventViewSet(AsyncReadMixin, viewsets.GenericViewSet):
+    """
+    The current user's events (see marketplace.events) after ?cursor=, oldest
+    first; each response carries the cursor to send next. With none yet, the
+    async view (ASYNC_READ_VIEWS) waits up to ?wait= seconds (default 0, cap
+    EVENTS_MAX_WAIT) for the next one, so clients long-poll this instead of
+    re-fetching /api/proposals/. The sync view never waits: a long-poll would
+    hold a WSGI worker for its whole duration.
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+    filter_backends = []
+    # A waiting request takes a slot per query rather than for the whole wait.
+    async_db_slot = False
+
+    def get_cursor(self, request):
+        try:
+            return int(request.query_params.get("cursor", 0))
+        except ValueError:
+            raise ValidationError({"cursor": ["Expected the cursor of a previous response."]})
+
+    def events_response(self, cursor, notifications):
+        return Response({
+            "results": self.get_serializer(notifications, many=True).data,
+            "cursor": notifications[-1].pk if notifications else cursor,
+        })
+
+    def list(self, request):
+        cursor = self.get_cursor(request)
+        return self.events_response(cursor, list(events.after(request.user.pk, cursor)))
+
+    async def alist(self, request):
+        cursor = self.get_cursor(request)
+        try:
+            wait = max(0.0, min(float(request.query_params.get("wait", 0)), settings.EVENTS_MAX_WAIT))
+        except ValueError:
+            wait = 0.0
+        return self.events_response(cursor, await events.apoll(request.user.pk, cursor, wait, db_slots()))
@@ -0,0 +1,92 @@
+# Throughput and tail latency of the read API under concurrency: gunicorn sync workers (WSGI)
+# vs gunicorn + uvicorn workers (ASGI, async read views).
+# Usage (from backend/, needs `pip install httpx`):
+#   BENCH_CONCURRENCY=16,64,256 BENCH_DURATION=15 BENCH_WORKERS=4 python scripts/bench_asgi.py
+# Each server gets the same worker count; requests cycle through ENDPOINTS with a bearer token.
+import asyncio, os, socket, statistics, subprocess, sys, time
+import django
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "artfit.settings")
+django.setup()
+from accounts.authentication import ArtFitRefreshToken
+from accounts.models import User
+from marketplace.models import Project
+
+CONCURRENCY = [int(c) for c in os.getenv("BENCH_CONCURRENCY", "16,64,256").split(",")]
+DURATION = float(os.getenv("BENCH_DURATION", "15"))
+WORKERS = os.getenv("BENCH_WORKERS", "4")
+SERVERS = {
+    "wsgi": ["gunicorn", "artfit.wsgi:application", "-w", WORKERS],
+    # gunicorn's 2s default keep-alive races the load generator's reused connections under uvicorn.
+    "asgi": ["gunicorn", "artfit.asgi:application", "-w", WORKERS, "-k", "uvicorn.workers.UvicornWorker", "--keep-alive", "30"],
+}
+
+user, _ = User.objects.get_or_create(username="bench_asgi")
+token = str(ArtFitRefreshToken.for_user(user).access_token)
+project_id = Project.objects.order_by("-id").values_list("id", flat=True).first()
+ENDPOINTS = [
+    "/api/projects/",
+    "/api/projects/?search=react dashboard",
+    f"/api/projects/{project_id}/",
+    "/api/skills/",
+    "/api/accounts/me/",
+]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start(name):
+    port = free_port()
+    cmd = SERVERS[name] + ["-b", f"127.0.0.1:{port}", "--log-level", "warning"]
+    async_views = "1" if name == "asgi" else "0"
+    proc = subprocess.Popen(cmd, env={**os.environ, "PYTHONWARNINGS": "ignore", "ASYNC_READ_VIEWS": async_views})
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(base + "/api/skills/", timeout=1)
+            return proc, base
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.kill()
+    raise SystemExit(f"{name} server did not start")
+
+async def load(base, concurrency):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + DURATION
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, headers=headers, limits=limits, timeout=60) as client:
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                try:
+                    r = await client.get(ENDPOINTS[i % len(ENDPOINTS)])
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append((time.perf_counter() - t0) * 1000)
+                errors += not ok
+                i += 1
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, latencies, errors
+
+print(f"{'server':6s} {'conc':>5s} {'req/s':>8s} {'p50':>8s} {'p99':>8s} {'errors':>7s}")
+for name in SERVERS:
+    proc, base = start(name)
+    try:
+        asyncio.run(load(base, 4))  # warm up connections and caches
+        for concurrency in CONCURRENCY:
+            rps, latencies, errors = asyncio.run(load(base, concurrency))
+            q = statistics.quantiles(latencies, n=100)
+            print(f"{name:6s} {concurrency:5d} {rps:8.0f} {q[49]:6.1f}ms {q[98]:6.1f}ms {errors:7d}")
+    finally:
+        proc.terminate()
+        proc.wait()
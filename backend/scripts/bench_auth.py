@@ -0,0 +1,27 @@
+# Queries and time per authentication: simplejwt's JWTAuthentication vs ClaimsJWTAuthentication.
+# The authenticators are called directly, so the numbers leave out the view's own queries.
+# Usage: python manage.py shell < scripts/bench_auth.py
+import statistics, time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from accounts.authentication import ArtFitRefreshToken, ClaimsJWTAuthentication
+from accounts.models import User
+
+RUNS = 1000
+
+user, _ = User.objects.get_or_create(username="bench_auth")
+access = str(ArtFitRefreshToken.for_user(user).access_token)
+request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+for label, auth_class in (("simplejwt", JWTAuthentication), ("claims", ClaimsJWTAuthentication)):
+    authenticator = auth_class()
+    authenticator.authenticate(request)  # warm the state cache
+    counts, samples = [], []
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            authenticator.authenticate(request)
+        samples.append((time.perf_counter() - t0) * 1000)
+        counts.append(len(ctx))
+    print(f"{label:9s} queries/authentication={statistics.mean(counts):.1f} p50={statistics.median(samples):.3f}ms")
@@ -0,0 +1,57 @@
+# Compare project search latency: legacy ILIKE SearchFilter vs full-text search_vector.
+# Usage: BENCH_PROJECTS=100000 python manage.py shell < scripts/bench_search.py
+import os, random, statistics, time
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Q
+from accounts.models import User
+from marketplace.models import Project, SkillTag, SEARCH_CONFIG
+
+TARGET = int(os.getenv("BENCH_PROJECTS", "100000"))
+RUNS = int(os.getenv("BENCH_RUNS", "50"))
+TERMS = ["game", "figma", "react dashboard", "minimalist", "mobile app", "postgresql"]
+WORDS = ("game mobile app web dashboard landing brand logo react vue django api figma "
+         "minimalist playful illustration shop portfolio data chart chat social").split()
+
+owner, _ = User.objects.get_or_create(username="bench_owner")
+tags = list(SkillTag.objects.all())
+missing = TARGET - Project.objects.count()
+if missing > 0:
+    print(f"Seeding {missing} projects...")
+    rnd = random.Random(42)
+    Through = Project.tags.through
+    for start in range(0, missing, 5000):
+        batch = Project.objects.bulk_create([
+            Project(owner=owner, title=" ".join(rnd.sample(WORDS, 3)),
+                    description=" ".join(rnd.choices(WORDS, k=40)),
+                    looking_for_role=rnd.choice(["DEV", "DES", "BOTH"]))
+            for _ in range(min(5000, missing - start))
+        ])
+        if tags:
+            Through.objects.bulk_create([
+                Through(project_id=p.id, skilltag_id=t.id) for p in batch for t in rnd.sample(tags, min(3, len(tags)))
+            ], ignore_conflicts=True)
+    Project.objects.filter(search_vector__isnull=True).refresh_search_vector()
+
+def legacy(term):
+    q = Q()
+    for bit in term.split():
+        q &= (Q(title__icontains=bit) | Q(description__icontains=bit)
+              | Q(looking_for_role__icontains=bit) | Q(tags__name__icontains=bit))
+    return list(Project.objects.filter(q).distinct().order_by("-created_at")[:20])
+
+def fulltext(term):
+    query = SearchQuery(term, config=SEARCH_CONFIG, search_type="websearch")
+    return list(Project.objects.filter(search_vector=query)
+                .annotate(search_rank=SearchRank(F("search_vector"), query))
+                .order_by("-search_rank", "-id")[:20])
+
+def p95(samples):
+    return statistics.quantiles(samples, n=20)[-1]
+
+for name, fn in (("legacy", legacy), ("fulltext", fulltext)):
+    samples = []
+    for i in range(RUNS):
+        t0 = time.perf_counter()
+        fn(TERMS[i % len(TERMS)])
+        samples.append((time.perf_counter() - t0) * 1000)
+    print(f"{name:9s} projects={Project.objects.count()} p50={statistics.median(samples):.1f}ms p95={p95(samples):.1f}ms")
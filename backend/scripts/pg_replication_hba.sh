@@ -0,0 +1,5 @@
+#!/bin/bash
+# Runs once from /docker-entrypoint-initdb.d on a fresh primary data directory:
+# lets the replica container stream WAL with the regular artfit credentials.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,93 @@
+# Concurrent proposal submission: double-submits, Idempotency-Key replays and a project closing mid-flight.
+# Usage: python manage.py shell < scripts/stress_proposals.py   (STRESS_USERS, STRESS_REPEATS to scale it)
+import os, threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connections
+from rest_framework.test import APIClient
+from accounts.models import User
+from marketplace.models import Project, Proposal
+
+USERS = int(os.getenv("STRESS_USERS", "16"))
+REPEATS = int(os.getenv("STRESS_REPEATS", "8"))
+
+owner, _ = User.objects.get_or_create(username="stress_owner")
+submitters = [User.objects.get_or_create(username=f"stress_{i}")[0] for i in range(USERS)]
+failures = []
+
+def check(label, ok):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+def run_parallel(jobs):
+    barrier = threading.Barrier(len(jobs))
+    def run(job):
+        barrier.wait()
+        try:
+            return job()
+        finally:
+            connections.close_all()
+    with ThreadPoolExecutor(len(jobs)) as pool:
+        return list(pool.map(run, jobs))
+
+def submit(user, project, key=None, cover_letter="Hi"):
+    def job():
+        client = APIClient()
+        client.force_authenticate(user)
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        response = client.post("/api/proposals/", {"project": project.pk, "cover_letter": cover_letter}, format="json", **headers)
+        return response.status_code, response.data
+    return job
+
+def close(project):
+    def job():
+        Project.objects.filter(pk=project.pk).update(status="CLOSED")
+        return "closed", None
+    return job
+
+def counters_match(project):
+    project.refresh_from_db(fields=["proposal_count"])
+    return project.proposal_count == Proposal.objects.filter(project=project).count()
+
+# 1. Every submitter retries the same request REPEATS times at once, with one key each.
+project = Project.objects.create(owner=owner, title="Stress: replays", description="-")
+results = run_parallel([submit(user, project, key=f"k{user.pk}") for user in submitters for _ in range(REPEATS)])
+codes = Counter(code for code, _ in results)
+print("replays:", dict(codes))
+check("one 201 per submitter, the rest replayed", codes == {201: USERS, 200: USERS * (REPEATS - 1)})
+ids = {}
+for code, data in results:
+    ids.setdefault(data["submitter"], set()).add(data["id"])
+check("every replay returned the original proposal", all(len(v) == 1 for v in ids.values()))
+check("proposal_count matches", counters_match(project))
+
+# 2. The same, without a key: one 201 per submitter, 409 for the duplicates.
+project = Project.objects.create(owner=owner, title="Stress: duplicates", description="-")
+results = run_parallel([submit(user, project) for user in submitters for _ in range(REPEATS)])
+codes = Counter(code for code, _ in results)
+print("duplicates:", dict(codes))
+check("one 201 per submitter, the rest 409", codes == {201: USERS, 409: USERS * (REPEATS - 1)})
+check("proposal_count matches", counters_match(project))
+
+# 3. The project closes while submissions race it: whatever committed is counted, nothing else is.
+project = Project.objects.create(owner=owner, title="Stress: closing", description="-")
+jobs = [submit(user, project, key=f"c{user.pk}") for user in submitters]
+jobs.insert(len(jobs) // 2, close(project))
+results = run_parallel(jobs)
+codes = Counter(code for code, _ in results)
+print("closing:", dict(codes))
+created = Proposal.objects.filter(project=project).count()
+check("no 5xx", not any(isinstance(code, int) and code >= 500 for code in codes))
+check("201s match the proposals stored", codes[201] == created)
+check("the rest were refused as closed", codes[400] == USERS - created)
+check("proposal_count matches", counters_match(project))
+results = run_parallel([submit(user, project, key=f"c{user.pk}") for user in submitters])
+check("replays still succeed after closing", Counter(code for code, _ in results) == Counter({200: created, 400: USERS - created}))
+
+# 4. A key reused for another project is refused.
+code, _ = submit(submitters[0], Project.objects.create(owner=owner, title="Stress: reuse", description="-"), key=f"k{submitters[0].pk}")()
+check("key reuse on another project is a 422", code == 422)
+
+Project.objects.filter(owner=owner).delete()
+print("FAILED:" if failures else "All checks passed.", *failures)
@@ -1,20 +1,29 @@
 # backend/wait_for_db.py
-import os, time, psycopg2
+"""
+Block until every configured database (the primary and, if set, the replica)
+accepts connections. Connects with the same parameters Django would, from
+artfit.settings, but directly rather than through the pool, so each attempt
+fails fast instead of waiting out DB_POOL_TIMEOUT.
+"""
+import os, sys, time
 
-host = os.getenv("DB_HOST", "db")
-port = int(os.getenv("DB_PORT", "5432"))
-name = os.getenv("DB_NAME", "artfit")
-user = os.getenv("DB_USER", "artfit")
-password = os.getenv("DB_PASSWORD", "artfit")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "artfit.settings")
 
-for i in range(60):
-    try:
-        conn = psycopg2.connect(host=host, port=port, dbname=name, user=user, password=password)
-        conn.close()
-        print("DB is ready.")
-        break
-    except Exception as e:
-        print(f"Waiting for DB... ({i+1}/60) {e}")
-        time.sleep(1)
-else:
-    raise SystemExit("Postgres not reachable after 60s")
+import django
+from django.db import connections
+
+django.setup()
+
+for alias in connections:
+    wrapper = connections[alias]
+    for i in range(60):
+        try:
+            wrapper.Database.connect(**wrapper.get_connection_params()).close()
+            print(f"DB {alias} is ready.")
+            break
+        except wrapper.Database.OperationalError as e:
+            print(f"Waiting for DB {alias}... ({i+1}/60) {e}")
+            time.sleep(1)
+    else:
+        raise SystemExit(f"Postgres ({alias}) not reachable after 60s")
@@ -24,6 +24,22 @@ export const auth = {
 
 export const api = axios.create({ baseURL: API_BASE })
 
+type Page<T> = { results: T[]; next: string | null }
+
+// Follows `next` links of a cursor-paginated list (or returns an unpaginated one as is).
+export async function getAllPages<T>(url: string, params?: Record<string, unknown>): Promise<T[]> {
+  const items: T[] = []
+  let next: string | null = url
+  while (next) {
+    // `next` is absolute and already carries the cursor and params.
+    const r = await api.get<Page<T> | T[]>(next, next === url ? { params } : undefined)
+    if (Array.isArray(r.data)) return r.data
+    items.push(...r.data.results)
+    next = r.data.next
+  }
+  return items
+}
+
 api.interceptors.request.use(cfg => {
   if (auth.access) {
     cfg.headers.Authorization = `Bearer ${auth.access}`
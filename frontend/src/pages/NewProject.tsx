@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react'
 import { useNavigate, Link } from 'react-router-dom'
-import { api } from '../lib/api'
+import { api, getAllPages } from '../lib/api'
 import { isAxiosError } from 'axios'
 import logo from '../assets/logo.png'
 
@@ -25,7 +25,7 @@ export default function NewProject() {
   const [newTagKind, setNewTagKind] = useState<'ROLE' | 'TOOL' | 'STYLE' | 'GENRE'>('TOOL')
 
   useEffect(() => {
-    api.get('/skills/').then(r => setSkills(r.data)).catch(() => setSkills([]))
+    getAllPages<Skill>('/skills/', { page_size: 500 }).then(setSkills).catch(() => setSkills([]))
   }, [])
 
   function toggleTag(id: number) {
@@ -1,5 +1,5 @@
 import { useEffect, useMemo, useState } from 'react'
-import { api, auth } from '../lib/api'
+import { api, auth, getAllPages } from '../lib/api'
 import { useNavigate } from 'react-router-dom'
 
 type User = { id: number; username: string; email: string; role?: string }
@@ -28,8 +28,11 @@ export default function Profile() {
         // Set current avatar preview if present
         const avatarUrl = r.data?.profile?.avatar
         if (avatarUrl) setAvatarPreview(avatarUrl)
-        // Works come embedded
+        // /me/ embeds only the latest works; show those, then the full paginated list
         if (Array.isArray(r.data?.works)) setWorks(r.data.works)
+        getAllPages<Work>('/accounts/works/')
+          .then(setWorks)
+          .catch(err => console.error('Failed to load works', err))
       })
       .catch(err => {
         console.error('Profile API error:', err)
@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { getAllPages } from '../lib/api'
 
 type Skill = { id: number; name: string; kind: string }
 
@@ -8,8 +8,8 @@ export default function Skills() {
   const [loading, setLoading] = useState(true)
 
   useEffect(() => {
-    api.get('/skills/')
-      .then(r => setSkills(r.data))
+    getAllPages<Skill>('/skills/', { page_size: 500 })
+      .then(setSkills)
       .finally(() => setLoading(false))
   }, [])
 